@@ -0,0 +1,359 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import instrumentacion
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Comandos cuyo arranque en frío se mide: nombre -> argumentos de python
+ARRANQUE = {
+    'main.py resumen': ['main.py', 'resumen'],
+    'import main': ['-c', 'import main'],
+    'import staging': ['-c', 'import staging'],
+    'import modelado': ['-c', 'import modelado'],
+    'import series': ['-c', 'import series'],
+}
+
+# Tamaños por defecto de la suite (filas totales de los exports sintéticos)
+TAMANOS = [10**3, 10**4, 10**5]
+# Filas que se generan y escriben por bloque
+FILAS_POR_BLOQUE = 100_000
+# Plantillas de páginas que se renderizan por tamaño (puede haber millones)
+MAX_PAGINAS = 20
+# Segundos entre muestras de RSS mientras corre un paso
+INTERVALO_RSS = 0.005
+# Un paso se reporta como regresión si tarda más que esto veces la corrida anterior
+UMBRAL_REGRESION = 1.2
+
+
+def medir_arranque(comandos=None, repeticiones=5):
+    """
+    Mide el tiempo de arranque de cada comando en un proceso nuevo de Python.
+
+    Args:
+        comandos: Diccionario nombre -> argumentos (None para ARRANQUE)
+        repeticiones: Veces que se ejecuta cada comando
+
+    Returns:
+        Diccionario nombre -> {'min_ms', 'mediana_ms'}
+    """
+    resultados = {}
+    for nombre, args in (comandos or ARRANQUE).items():
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            subprocess.run([sys.executable, *args], cwd=DIRECTORIO, check=True,
+                           stdout=subprocess.DEVNULL)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        resultados[nombre] = {'min_ms': round(min(tiempos), 1),
+                              'mediana_ms': round(statistics.median(tiempos), 1)}
+    return resultados
+
+
+def _leer_plantilla(ruta):
+    """
+    Divide un export de GA en partes: filas que se copian tal cual (comentarios,
+    separadores) y secciones (encabezado de columnas más filas de datos).
+    """
+    partes, seccion = [], None
+    with open(ruta, newline='', encoding='utf-8') as f:
+        for fila in csv.reader(f):
+            es_comentario = bool(fila) and fila[0].startswith('#')
+            vacia = not any(c.strip() for c in fila)
+            if es_comentario or vacia:
+                seccion = None
+                partes.append(('texto', fila))
+            elif seccion is None:
+                seccion = (fila, [])
+                partes.append(('seccion', seccion))
+            else:
+                seccion[1].append(fila)
+    return partes
+
+
+def _tipo_columna(valores):
+    """'int', 'float' o 'texto' según los valores de ejemplo de una columna."""
+    presentes = [v for v in valores if v != '']
+    if not presentes:
+        return 'vacia'
+    try:
+        numeros = [float(v) for v in presentes]
+    except ValueError:
+        return 'texto'
+    return 'int' if all(n.is_integer() and '.' not in v for n, v in zip(numeros, presentes)) else 'float'
+
+
+def _generar_bloque(rng, encabezado, ejemplos, inicio, n):
+    """Columnas de texto de n filas sintéticas (desde la fila `inicio`) con los tipos del ejemplo."""
+    columnas = []
+    for j, nombre in enumerate(encabezado):
+        valores = [f[j] if j < len(f) else '' for f in ejemplos]
+        tipo = _tipo_columna(valores)
+        if j == 0 and nombre == "Nth day":
+            columnas.append([str(i) for i in range(inicio, inicio + n)])
+        elif j == 0:
+            # La primera columna es la llave natural de la sección: tiene que ser única
+            base = valores or [nombre]
+            columnas.append([base[i] if i < len(base) else f"{base[i % len(base)]} ({i})"
+                             for i in range(inicio, inicio + n)])
+        elif tipo == 'vacia' or not nombre:
+            columnas.append([''] * n)
+        elif tipo == 'texto':
+            columnas.append([valores[i % len(valores)] for i in range(inicio, inicio + n)])
+        else:
+            maximo = max(float(v) for v in valores if v != '') * 2 or 10
+            if tipo == 'int':
+                columnas.append([str(x) for x in rng.integers(0, int(maximo) + 1, n).tolist()])
+            else:
+                columnas.append([f"{x:.10g}" for x in rng.uniform(0, maximo, n).tolist()])
+    return columnas
+
+
+def generar_exports(destino, filas, semilla=0, origen=DIRECTORIO):
+    """
+    Genera exports sintéticos con el mismo formato que los CSV de GA de ejemplo.
+
+    Se conservan los encabezados de comentario, las secciones y el relleno de
+    comas de cada archivo; solo se reemplazan las filas de datos. Las `filas`
+    se reparten entre las secciones por dimensión (país, página, navegador...);
+    las secciones "Nth day" conservan su número de días, que depende del rango.
+
+    Args:
+        destino: Carpeta donde se escriben los CSV
+        filas: Filas de datos totales a generar
+        semilla: Semilla del generador aleatorio
+        origen: Carpeta con los exports de ejemplo que sirven de plantilla
+
+    Returns:
+        Diccionario archivo -> filas de datos escritas
+    """
+    import numpy as np
+
+    import ingesta
+
+    rng = np.random.default_rng(semilla)
+    plantillas = {}
+    for archivo, _ in ingesta.FUENTES.values():
+        ruta = os.path.join(origen, archivo)
+        if os.path.exists(ruta):
+            plantillas[archivo] = _leer_plantilla(ruta)
+    secciones = [s for partes in plantillas.values() for tipo, s in partes
+                 if tipo == 'seccion' and s[0][0] != "Nth day"]
+    por_seccion = max(1, filas // max(1, len(secciones)))
+
+    os.makedirs(destino, exist_ok=True)
+    escritas = {}
+    for archivo, partes in plantillas.items():
+        escritas[archivo] = 0
+        with open(os.path.join(destino, archivo), 'w', newline='', encoding='utf-8') as f:
+            escritor = csv.writer(f)
+            for tipo, contenido in partes:
+                if tipo == 'texto':
+                    escritor.writerow(contenido)
+                    continue
+                encabezado, ejemplos = contenido
+                escritor.writerow(encabezado)
+                total = len(ejemplos) if encabezado[0] == "Nth day" else por_seccion
+                for inicio in range(0, total, FILAS_POR_BLOQUE):
+                    n = min(FILAS_POR_BLOQUE, total - inicio)
+                    escritor.writerows(zip(*_generar_bloque(rng, encabezado, ejemplos, inicio, n)))
+                escritas[archivo] += total
+    return escritas
+
+
+def _medir(resultados, nombre, fn, *args, **kwargs):
+    """
+    Ejecuta un paso y guarda sus segundos y su pico de memoria.
+
+    La memoria se muestrea desde otro hilo (tracemalloc distorsiona mucho los
+    tiempos del parseo en Python puro): 'pico_mb' es lo que creció el RSS
+    sobre el inicio del paso y 'rss_mb' el RSS máximo observado.
+    """
+    base = instrumentacion.rss_mb()
+    pico = [base]
+    fin = threading.Event()
+
+    def muestrear():
+        while not fin.wait(INTERVALO_RSS):
+            pico[0] = max(pico[0], instrumentacion.rss_mb())
+
+    hilo = threading.Thread(target=muestrear, daemon=True)
+    hilo.start()
+    inicio = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            valor = fn(*args, **kwargs)
+    finally:
+        segundos = time.perf_counter() - inicio
+        fin.set()
+        hilo.join()
+    pico = max(pico[0], instrumentacion.rss_mb())
+    resultados[nombre] = {'segundos': round(segundos, 4), 'pico_mb': round(pico - base, 2),
+                          'rss_mb': round(pico, 1)}
+    return valor
+
+
+def _renderizar(fn):
+    """Renderiza una plantilla hasta el bitmap (como lo hace el dashboard) y la suelta."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    import staging
+
+    fig = staging.render_figure(fn)
+    if fig is not None:
+        FigureCanvasAgg(fig).draw()
+    staging.soltar_figura(fn)
+
+
+def medir_tamano(filas, semilla=0, graficas=True):
+    """
+    Corre todos los pasos del proyecto sobre exports sintéticos de `filas` filas.
+
+    Se trabaja en una carpeta temporal (base, caché columnar y CSV propios).
+    Con graficas=False se omiten los pasos plot:* (con miles de categorías por
+    gráfica son, por mucho, los más lentos).
+
+    Returns:
+        Diccionario paso -> {'segundos', 'pico_mb'}
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import numpy as np
+    import sqlite3
+
+    import main
+    import modelado
+    import series
+    import staging
+    import vistas
+
+    resultados = {}
+    previo = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as carpeta:
+        os.chdir(carpeta)
+        try:
+            _medir(resultados, 'generar', generar_exports, carpeta, filas, semilla)
+            conn = sqlite3.connect(main.ingesta.DB_PATH)
+            _medir(resultados, 'ingesta', main.ingesta.ingestar, conn)
+            _medir(resultados, 'vistas', vistas.refrescar_vistas, conn)
+            _medir(resultados, 'series', series.actualizar_series, conn)
+            _medir(resultados, 'bosquejos', modelado.actualizar_bosquejos, conn)
+            _medir(resultados, 'resumen_aproximado', modelado.resumen_aproximado, conn)
+            tablas = _medir(resultados, 'carga', main.cargar_tablas, conn)
+            conn.close()
+            _medir(resultados, 'carga_dashboard', staging.cargar)
+
+            # convert_numeric sobre las tablas como texto, igual que si vinieran de read_csv
+            como_texto = []
+            for df in tablas.values():
+                numericas = list(df.select_dtypes(include=[np.number]).columns)
+                como_texto.append((df[numericas].astype(str), numericas))
+            _medir(resultados, 'convert_numeric',
+                   lambda: [staging.convert_numeric(df, cols) for df, cols in como_texto])
+
+            if graficas:
+                for fn in staging.PLANTILLAS_BASE:
+                    _medir(resultados, f'plot:{fn.__name__}', _renderizar, fn)
+                paginas = [fn for fn in staging.templates if fn not in staging.PLANTILLAS_BASE]
+                _medir(resultados, 'plot:paginas', lambda: [_renderizar(fn) for fn in paginas[:MAX_PAGINAS]])
+                resultados['plot:paginas']['plantillas'] = len(paginas)
+
+            df = tablas['pages_df'].select_dtypes(include=[np.number])
+            columna = df.columns[0]
+            _medir(resultados, 'modelado:limpiar_datos', modelado.limpiar_datos, df)
+            _medir(resultados, 'modelado:imputar_valores', modelado.imputar_valores, df, 'media')
+            _medir(resultados, 'modelado:normalizar_minmax', modelado.normalizar_datos, df, metodo='minmax')
+            _medir(resultados, 'modelado:normalizar_zscore', modelado.normalizar_datos, df, metodo='zscore')
+            _medir(resultados, 'modelado:calcular_estadisticas', modelado.calcular_estadisticas, df)
+            _medir(resultados, 'modelado:describir_muestra', modelado.describir_muestra, df)
+            _medir(resultados, 'modelado:detectar_outliers', modelado.detectar_outliers, df, columna)
+            _medir(resultados, 'modelado:pipeline', modelado.Pipeline().ejecutar, df)
+            bloques = (df.iloc[i:i + FILAS_POR_BLOQUE] for i in range(0, len(df), FILAS_POR_BLOQUE))
+            _medir(resultados, 'modelado:ajustar_por_bloques', modelado.Pipeline().ajustar_por_bloques, bloques)
+        finally:
+            os.chdir(previo)
+    return resultados
+
+
+def ejecutar_suite(tamanos=None, semilla=0, graficas=True):
+    """
+    Corre medir_tamano() para cada tamaño.
+
+    Returns:
+        Diccionario serializable a JSON con el entorno y los resultados por tamaño
+    """
+    resultados = {}
+    for filas in tamanos or TAMANOS:
+        resultados[str(filas)] = medir_tamano(filas, semilla, graficas)
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'semilla': semilla,
+        # Pico de RSS de todo el proceso (ru_maxrss está en KiB en Linux)
+        'rss_max_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'resultados': resultados,
+    }
+
+
+def comparar(actual, anterior, umbral=UMBRAL_REGRESION):
+    """
+    Compara dos corridas de la suite.
+
+    Returns:
+        Lista de (tamaño, paso, segundos antes, segundos ahora) de los pasos que
+        tardaron más de `umbral` veces lo de la corrida anterior
+    """
+    regresiones = []
+    for filas, pasos in actual['resultados'].items():
+        for paso, medida in pasos.items():
+            previa = anterior.get('resultados', {}).get(filas, {}).get(paso)
+            if previa and previa['segundos'] > 0 and medida['segundos'] > umbral * previa['segundos']:
+                regresiones.append((filas, paso, previa['segundos'], medida['segundos']))
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks del proyecto")
+    parser.add_argument('modo', choices=['arranque', 'suite', 'generar'])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--filas', type=int, nargs='+', default=TAMANOS,
+                        help="filas totales de los exports sintéticos (p.ej. 1000 100000 10000000)")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', default='benchmark.json', help="JSON de resultados (suite)")
+    parser.add_argument('--sin-graficas', action='store_true', help="omitir los pasos plot:*")
+    parser.add_argument('--comparar', metavar='JSON', help="corrida anterior para detectar regresiones")
+    parser.add_argument('--destino', default='exports_sinteticos', help="carpeta de salida (generar)")
+    args = parser.parse_args()
+
+    if args.modo == 'arranque':
+        for nombre, t in medir_arranque(repeticiones=args.repeticiones).items():
+            print(f"{nombre}: {t['min_ms']:.0f} ms (mediana {t['mediana_ms']:.0f} ms)")
+    elif args.modo == 'generar':
+        for archivo, n in generar_exports(args.destino, args.filas[0], args.semilla).items():
+            print(f"{archivo}: {n} filas")
+    else:
+        reporte = ejecutar_suite(args.filas, args.semilla, not args.sin_graficas)
+        with open(args.salida, 'w') as f:
+            json.dump(reporte, f, indent=1)
+        for filas, pasos in reporte['resultados'].items():
+            print(f"== {filas} filas")
+            for paso, medida in pasos.items():
+                print(f"{paso}: {medida['segundos'] * 1000:.1f} ms, pico {medida['pico_mb']:.1f} MB")
+        if args.comparar:
+            with open(args.comparar) as f:
+                for filas, paso, antes, ahora in comparar(reporte, json.load(f)):
+                    print(f"REGRESIÓN {filas} filas {paso}: {antes:.3f} s -> {ahora:.3f} s")
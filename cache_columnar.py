@@ -0,0 +1,108 @@
+import glob
+import hashlib
+import os
+
+import pandas as pd
+
+import ingesta
+import instrumentacion
+
+# Carpeta del caché Arrow IPC; se puede desactivar con WEBVIEW_SIN_CACHE=1
+CACHE_DIR = '.cache_tablas'
+HABILITADO = os.environ.get('WEBVIEW_SIN_CACHE') != '1'
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pyarrow es opcional: sin él se lee directo de SQLite
+    pa = None
+
+
+def _ruta(tabla, version, clave):
+    return os.path.join(CACHE_DIR, f"{tabla}-v{version}-{clave}.arrow")
+
+
+def _limpiar_viejos(tabla, clave, vigente):
+    for ruta in glob.glob(os.path.join(CACHE_DIR, f"{glob.escape(tabla)}-v*-{clave}.arrow")):
+        if ruta != vigente:
+            os.remove(ruta)
+
+
+def leer_sql(conn, tabla, sql, params=(), preparar=None):
+    """
+    Ejecuta una consulta con caché columnar en disco.
+
+    El resultado ya tipado se guarda como Arrow IPC y en las siguientes
+    corridas se abre con memory-map, sin pasar por SQLite ni por la conversión
+    de tipos. La entrada se invalida cuando cambia la versión de la tabla en
+    _versiones (la escriben ingesta.py y vistas.py) o cuando la base es otra
+    (ruta distinta o base borrada y vuelta a crear, ver ingesta.generacion_base).
+
+    Args:
+        conn: Conexión a SQLite
+        tabla: Tabla (o vista) de la que depende la consulta
+        sql: Consulta a ejecutar
+        params: Parámetros de la consulta
+        preparar: Función opcional que tipa el DataFrame antes de guardarlo; su
+            nombre y su atributo `version` (si lo tiene) forman parte de la clave
+
+    Returns:
+        DataFrame con el resultado
+    """
+    with instrumentacion.span(f"read_sql:{tabla}") as s:
+        df = _leer_sql(conn, tabla, sql, params, preparar, s)
+        s['filas'] = len(df)
+        s['bytes'] = int(df.memory_usage(index=False).sum())
+    return df
+
+
+def _archivo_base(conn):
+    """Ruta absoluta del archivo de la base ('' para bases ':memory:')."""
+    ruta = conn.execute("PRAGMA database_list").fetchone()[2]
+    return os.path.abspath(ruta) if ruta else ''
+
+
+def _leer_sql(conn, tabla, sql, params, preparar, s):
+    archivo = _archivo_base(conn) if pa is not None and HABILITADO else ''
+    # Las bases ':memory:' (p.ej. hadoopIns.a_sqlite) tienen sus propias versiones: no se cachean
+    if not archivo:
+        df = pd.read_sql_query(sql, conn, params=params)
+        return preparar(df) if preparar else df
+
+    version = ingesta.version_tabla(conn, tabla)
+    etiqueta = None if preparar is None else (
+        preparar.__module__, preparar.__qualname__, getattr(preparar, 'version', None))
+    identidad = (archivo, ingesta.generacion_base(conn))
+    clave = hashlib.sha1(repr((identidad, sql, tuple(params), etiqueta)).encode()).hexdigest()[:16]
+    ruta = _ruta(tabla, version, clave)
+    if os.path.exists(ruta):
+        s['cache'] = 'acierto'
+        instrumentacion.contar('cache_columnar:aciertos')
+        with pa.memory_map(ruta, 'r') as fuente:
+            return pa.ipc.open_file(fuente).read_all().to_pandas()
+
+    s['cache'] = 'fallo'
+    instrumentacion.contar('cache_columnar:fallos')
+    df = pd.read_sql_query(sql, conn, params=params)
+    if preparar:
+        df = preparar(df)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tabla_arrow = pa.Table.from_pandas(df, preserve_index=False)
+    temporal = ruta + '.tmp'
+    with pa.OSFile(temporal, 'wb') as destino:
+        with pa.ipc.new_file(destino, tabla_arrow.schema) as escritor:
+            escritor.write_table(tabla_arrow)
+    os.replace(temporal, ruta)
+    _limpiar_viejos(tabla, clave, ruta)
+    return df
+
+
+def leer_tabla(conn, tabla, preparar=None):
+    """Equivalente cacheado de pd.read_sql_query(f"SELECT * FROM {tabla}", conn)."""
+    return leer_sql(conn, tabla, f'SELECT * FROM {ingesta._q(tabla)}', preparar=preparar)
+
+
+def limpiar_cache():
+    """Borra todos los archivos del caché."""
+    for ruta in glob.glob(os.path.join(CACHE_DIR, '*.arrow')):
+        os.remove(ruta)
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+import cache_columnar
+import ingesta
+
+# Tipos de columna de los reportes de GA. Las dimensiones se cargan como
+# category; las métricas se bajan a int32/float32.
+DIMENSIONES = {
+    "Audience name", "Country", "Country ID", "Browser", "Platform", "Operating system",
+    "Platform / device category", "Device category", "Screen resolution", "App",
+    "Page path and screen class", "Page title and screen class", "Event name",
+    "First user primary channel group (Default Channel Group)",
+    "Session primary channel group (Default Channel Group)",
+    "Date", "metrica", "fecha", "fin_export",
+} | set(ingesta.COLUMNAS_CLAVE)
+METRICAS_ENTERAS = {
+    "Total users", "New users", "Returning users", "Active users", "Sessions",
+    "Engaged sessions", "Event count", "Key events", "Views", "Crash-free users",
+    "Nth day", "1 day", "7 days", "30 days",
+}
+# El dinero se queda en float64: float32 solo tiene ~7 dígitos significativos
+METRICAS_FLOAT64 = {"Total revenue"}
+
+# Fracción mínima de vacíos para guardar una métrica como columna dispersa
+UMBRAL_DISPERSO = 0.9
+# Las columnas de texto que no están en DIMENSIONES se vuelven category si
+# tienen a lo más esta fracción de valores distintos
+UMBRAL_CATEGORIA = 0.5
+# Cambia cuando cambian las reglas: invalida lo guardado en el caché columnar
+VERSION_ESQUEMA = 2
+
+
+def _entero(serie):
+    """Baja una serie numérica a int32 si todos sus valores son enteros y caben."""
+    if serie.isna().any():
+        return None
+    valores = serie.to_numpy()
+    info = np.iinfo(np.int32)
+    if len(valores) and (valores.min() < info.min or valores.max() > info.max):
+        return None
+    if not pd.api.types.is_integer_dtype(serie) and not np.array_equal(valores, np.round(valores)):
+        return None
+    return serie.astype(np.int32)
+
+
+def compactar(df):
+    """
+    Asigna tipos compactos a un DataFrame leído de SQLite.
+
+    Las dimensiones de GA pasan a category y las métricas a int32 (conteos sin
+    vacíos) o float32 (tasas, promedios y conteos con vacíos); el dinero se
+    queda en float64. Las columnas que no están en el esquema se infieren.
+
+    Args:
+        df: DataFrame a compactar
+
+    Returns:
+        DataFrame con los tipos compactos (el original no se modifica)
+    """
+    df = df.copy()
+    for col in df.columns:
+        serie = df[col]
+        # pandas >= 3 lee el texto como dtype 'str' y no object: se aceptan ambos
+        texto = pd.api.types.is_string_dtype(serie) or pd.api.types.is_object_dtype(serie)
+        if col in DIMENSIONES or (texto and not isinstance(serie.dtype, pd.CategoricalDtype)
+                                  and serie.nunique() <= max(1, UMBRAL_CATEGORIA * len(serie))):
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                df[col] = serie.astype('category')
+        elif pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            if col in METRICAS_FLOAT64:
+                df[col] = serie.astype(np.float64)
+                continue
+            entero = _entero(serie) if col in METRICAS_ENTERAS or pd.api.types.is_integer_dtype(serie) else None
+            df[col] = entero if entero is not None else serie.astype(np.float32)
+    return df
+
+
+compactar.version = VERSION_ESQUEMA
+
+
+def dispersar(df, umbral=UMBRAL_DISPERSO):
+    """
+    Guarda como SparseDtype las métricas casi vacías (p.ej. las semanas de un
+    cohorte o columnas que solo traen algunos rangos de fechas).
+
+    Se aplica después del caché columnar porque Arrow no guarda columnas dispersas.
+
+    Args:
+        df: DataFrame ya compactado
+        umbral: Fracción mínima de vacíos para volver dispersa una columna
+
+    Returns:
+        El mismo DataFrame, con las columnas dispersas reemplazadas
+    """
+    if not len(df):
+        return df
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_float_dtype(serie) and serie.isna().mean() >= umbral:
+            df[col] = serie.astype(pd.SparseDtype(serie.dtype, np.nan))
+    return df
+
+
+def leer_sql(conn, tabla, sql, params=()):
+    """Lectura con caché columnar (ver cache_columnar.leer_sql) y tipos compactos."""
+    return dispersar(cache_columnar.leer_sql(conn, tabla, sql, params, preparar=compactar))
+
+
+def leer_tabla(conn, tabla):
+    """Equivalente compacto de cache_columnar.leer_tabla."""
+    return leer_sql(conn, tabla, f'SELECT * FROM {ingesta._q(tabla)}')
+
+
+def memoria_mb(df):
+    """Memoria de un DataFrame en MB, contando el contenido de los strings."""
+    return df.memory_usage(index=True, deep=True).sum() / 2**20
@@ -0,0 +1,369 @@
+import argparse
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+import ingesta
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:  # solo este backend lo necesita; el resto del proyecto funciona sin él
+    pa = None
+
+# Raíz del dataset: una carpeta local o una URI de HDFS (hdfs://namenode:8020/ruta)
+DATASET = os.environ.get('WEBVIEW_DATASET', 'dataset_ga')
+# Particiones Hive, de la más gruesa a la más fina: property=<>/date=<Start date>/report=<tabla>
+PARTICIONES = ['property', 'date', 'report']
+# Valor de partición para propiedades o fechas vacías (el mismo que usa Hive)
+SIN_VALOR = '__HIVE_DEFAULT_PARTITION__'
+# Hash de cada export ya escrito; los nombres con '_' no los lee el descubrimiento de Arrow
+MANIFIESTO = '_manifiesto.json'
+
+
+def _requiere_pyarrow():
+    if pa is None:
+        raise ImportError("hadoopIns.py necesita pyarrow (pip install pyarrow)")
+
+
+def sistema_archivos(destino=DATASET):
+    """
+    Resuelve la raíz del dataset a un sistema de archivos de Arrow.
+
+    Returns:
+        Tupla (FileSystem, ruta dentro de ese sistema)
+    """
+    _requiere_pyarrow()
+    if '://' in destino:
+        return pafs.FileSystem.from_uri(destino)
+    return pafs.LocalFileSystem(), os.path.abspath(destino)
+
+
+def _particion(raiz, propiedad, fecha, reporte):
+    valores = [quote(str(v), safe='') if v else SIN_VALOR for v in (propiedad, fecha, reporte)]
+    return "/".join([raiz] + [f"{k}={v}" for k, v in zip(PARTICIONES, valores)])
+
+
+def _esquema_particiones():
+    return ds.HivePartitioning(pa.schema([(p, pa.string()) for p in PARTICIONES]), null_fallback=SIN_VALOR)
+
+
+def _esquema(bloque, previo=None):
+    """
+    Esquema estable de una partición a partir de un bloque tipado por ingesta._tipar.
+
+    _tipar deja cada columna como numérica (enteros, decimales o todo vacío) o
+    como texto, y eso puede cambiar de un bloque a otro de la misma sección.
+    Las numéricas se guardan siempre como float64 y las de texto como string;
+    si `previo` ya tenía una columna como texto se mantiene así.
+
+    Args:
+        bloque: Tabla de Arrow de un bloque
+        previo: Esquema con el que ya se escribió la partición (o None)
+
+    Returns:
+        pa.Schema
+    """
+    campos = []
+    for campo in bloque.schema:
+        numerico = pa.types.is_integer(campo.type) or pa.types.is_floating(campo.type) or pa.types.is_null(campo.type)
+        if previo is not None and pa.types.is_string(previo.field(campo.name).type):
+            numerico = False
+        campos.append(pa.field(campo.name, pa.float64() if numerico else pa.string()))
+    return pa.schema(campos)
+
+
+def _ampliar(fs, escritor, temporal, esquema):
+    """Reescribe lo ya escrito de una partición con un esquema más amplio (números que pasan a texto)."""
+    escritor.close()
+    with fs.open_input_file(temporal) as f:
+        escrito = pq.read_table(f)
+    escritor = pq.ParquetWriter(temporal, esquema, filesystem=fs)
+    escritor.write_table(escrito.cast(esquema))
+    return escritor
+
+
+def _partes_viejas(fs, raiz, tabla, exportadas, finales):
+    """
+    Archivos part-<End date>.parquet de `tabla` y sus secciones que este export ya no escribe.
+
+    Args:
+        exportadas: Conjunto de (Property, Start date, End date) del export
+        finales: Rutas que el export está por escribir
+    """
+    viejas = []
+    for propiedad, fecha, fin in exportadas:
+        principal = _particion(raiz, propiedad, fecha, tabla)
+        carpeta = principal.rsplit('/', 1)[0]
+        parte = f"part-{fin or SIN_VALOR}.parquet"
+        for info in fs.get_file_info(pafs.FileSelector(carpeta, allow_not_found=True, recursive=True)):
+            reporte = info.path.rsplit('/', 2)[-2] if info.path.count('/') >= 2 else ''
+            if (info.type == pafs.FileType.File and info.base_name == parte and info.path not in finales
+                    and (f"{carpeta}/{reporte}" == principal or f"{carpeta}/{reporte}".startswith(principal + '__'))):
+                viejas.append(info.path)
+    return viejas
+
+
+def escribir_export(tabla, ruta, destino=DATASET):
+    """
+    Escribe las secciones de un export de GA como archivos Parquet particionados.
+
+    Cada sección va a property=<propiedad>/date=<Start date>/report=<tabla o
+    tabla__sección>/part-<End date>.parquet. Volver a escribir el mismo export
+    reemplaza sus archivos y borra los de secciones que ya no trae, así que la
+    escritura es idempotente. Las secciones grandes llegan en bloques (ver
+    ingesta.leer_secciones) y se escriben en streaming sin juntarlas en memoria.
+
+    Args:
+        tabla: Tabla destino según ingesta.FUENTES
+        ruta: Ruta del CSV exportado
+        destino: Raíz del dataset (carpeta o URI)
+
+    Returns:
+        Número de filas escritas
+    """
+    fs, raiz = sistema_archivos(destino)
+    escritores = {}
+    exportadas = set()
+    filas = 0
+    try:
+        for indice, seccion, meta, df in ingesta.leer_secciones(ruta):
+            reporte = tabla if indice == 0 else f"{tabla}__{seccion}"
+            for col in ingesta.COLUMNAS_CLAVE:
+                df[col] = meta.get(col) or ''
+            bloque = pa.Table.from_pandas(df, preserve_index=False)
+            clave = (meta.get('Property'), meta.get('Start date'), reporte, meta.get('End date'))
+            exportadas.add((clave[0], clave[1], clave[3]))
+            if clave not in escritores:
+                directorio = _particion(raiz, *clave[:3])
+                fs.create_dir(directorio, recursive=True)
+                final = f"{directorio}/part-{clave[3] or SIN_VALOR}.parquet"
+                # Se escribe con '.' al inicio (el descubrimiento lo ignora) y se renombra al cerrar
+                temporal = f"{directorio}/.part-{clave[3] or SIN_VALOR}.parquet.tmp"
+                escritores[clave] = (pq.ParquetWriter(temporal, _esquema(bloque), filesystem=fs), temporal, final)
+            escritor, temporal, final = escritores[clave]
+            esquema = _esquema(bloque, escritor.schema)
+            if not esquema.equals(escritor.schema):
+                escritor = _ampliar(fs, escritor, temporal, esquema)
+                escritores[clave] = (escritor, temporal, final)
+            escritor.write_table(bloque.cast(esquema))
+            filas += len(df)
+    finally:
+        for escritor, _, _ in escritores.values():
+            escritor.close()
+    finales = {final for _, _, final in escritores.values()}
+    for vieja in _partes_viejas(fs, raiz, tabla, exportadas, finales):
+        fs.delete_file(vieja)
+    for _, temporal, final in escritores.values():
+        fs.move(temporal, final)
+    return filas
+
+
+def _leer_manifiesto(fs, raiz):
+    try:
+        with fs.open_input_stream(f"{raiz}/{MANIFIESTO}") as f:
+            return json.loads(f.read().decode('utf-8'))
+    except (FileNotFoundError, OSError):
+        return {}
+
+
+def _escribir_manifiesto(fs, raiz, manifiesto):
+    with fs.open_output_stream(f"{raiz}/{MANIFIESTO}") as f:
+        f.write(json.dumps(manifiesto, indent=1).encode('utf-8'))
+
+
+def ingestar(directorio='.', destino=DATASET, forzar=False, lote=None, procesos=None):
+    """
+    Ingesta de exports de GA al dataset particionado.
+
+    Los exports cuyo hash no cambió desde la última corrida se saltan. Cada
+    export escribe solo sus propias particiones, así que se pueden escribir en
+    paralelo sin un escritor central (a diferencia de SQLite).
+
+    Args:
+        directorio: Carpeta con los CSV de una propiedad (ignorado si hay `lote`)
+        destino: Raíz del dataset (carpeta o URI)
+        forzar: Si es True se reescriben todos los exports
+        lote: Carpeta raíz con una subcarpeta por propiedad y rango (ver ingesta.buscar_exports)
+        procesos: Número de procesos para escribir en paralelo (None = núcleos disponibles)
+
+    Returns:
+        Diccionario ruta -> filas escritas (0 si el export no cambió)
+    """
+    fs, raiz = sistema_archivos(destino)
+    fs.create_dir(raiz, recursive=True)
+    if lote:
+        exports = ingesta.buscar_exports(lote)
+    else:
+        exports = [(tabla, os.path.join(directorio, archivo)) for tabla, (archivo, _) in ingesta.FUENTES.items()
+                   if os.path.exists(os.path.join(directorio, archivo))]
+    manifiesto = _leer_manifiesto(fs, raiz)
+    escritas, pendientes = {}, []
+    for tabla, ruta in exports:
+        h = f"v{ingesta.VERSION_LECTOR}:" + ingesta.hash_archivo(ruta)
+        if manifiesto.get(os.path.abspath(ruta)) == h and not forzar:
+            escritas[ruta] = 0
+        else:
+            pendientes.append((tabla, ruta, h))
+    if pendientes:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            filas = pool.map(escribir_export, [t for t, _, _ in pendientes], [r for _, r, _ in pendientes],
+                             [destino] * len(pendientes))
+            for (_, ruta, h), n in zip(pendientes, filas):
+                escritas[ruta] = n
+                manifiesto[os.path.abspath(ruta)] = h
+        _escribir_manifiesto(fs, raiz, manifiesto)
+    return escritas
+
+
+def _filtro(filtro):
+    """Convierte {columna: valor o lista de valores} a una expresión de Arrow (o la deja igual)."""
+    if filtro is None or not isinstance(filtro, dict):
+        return filtro
+    expresion = None
+    for columna, valor in filtro.items():
+        parte = (ds.field(columna).isin(valor) if isinstance(valor, (list, tuple, set))
+                 else ds.field(columna) == valor)
+        expresion = parte if expresion is None else expresion & parte
+    return expresion
+
+
+def fragmentos(reporte, destino=DATASET, propiedad=None, desde=None, hasta=None):
+    """
+    Archivos de un reporte que pasan la poda de particiones.
+
+    Solo se recorren directorios: con `propiedad` se baja directo a su
+    carpeta y las fechas se filtran por el nombre de la partición, sin abrir
+    ningún Parquet.
+
+    Args:
+        reporte: Tabla (p.ej. 'pages' o 'tech_overview__operating_system_active_users')
+        destino: Raíz del dataset (carpeta o URI)
+        propiedad: Propiedad de GA (None para todas)
+        desde: Start date mínimo 'AAAAMMDD' (incluido)
+        hasta: Start date máximo 'AAAAMMDD' (incluido)
+
+    Returns:
+        Lista de fragmentos de Arrow
+    """
+    fs, raiz = sistema_archivos(destino)
+    base = f"{raiz}/property={quote(propiedad, safe='')}" if propiedad else raiz
+    if fs.get_file_info(base).type == pafs.FileType.NotFound:
+        return []
+    particiones = _esquema_particiones()
+    todo = ds.dataset(base, filesystem=fs, format='parquet', partitioning=particiones,
+                      partition_base_dir=raiz, schema=particiones.schema)
+    expresion = ds.field('report') == reporte
+    if desde:
+        expresion &= ds.field('date') >= desde
+    if hasta:
+        expresion &= ds.field('date') <= hasta
+    return list(todo.get_fragments(filter=expresion))
+
+
+def leer(reporte, destino=DATASET, columnas=None, filtro=None, propiedad=None, desde=None, hasta=None,
+         compacto=True):
+    """
+    Lee un reporte del dataset con poda de particiones y predicados empujados a Parquet.
+
+    Args:
+        reporte: Tabla a leer
+        destino: Raíz del dataset (carpeta o URI)
+        columnas: Columnas a leer (None para todas)
+        filtro: {columna: valor o lista} o expresión de pyarrow.dataset; se evalúa
+            con las estadísticas de cada row group, sin leer los que no aplican
+        propiedad, desde, hasta: Poda por particiones (ver fragmentos)
+        compacto: Si es True se aplican los tipos de esquema.py
+
+    Returns:
+        DataFrame con las filas que cumplen el filtro
+    """
+    import pandas as pd
+
+    import esquema
+
+    encontrados = fragmentos(reporte, destino, propiedad, desde, hasta)
+    if not encontrados:
+        return pd.DataFrame()
+    fs, raiz = sistema_archivos(destino)
+    # Los archivos de distintos rangos pueden traer columnas distintas: se unifican
+    unificado = pa.unify_schemas([f.physical_schema for f in encontrados], promote_options='permissive')
+    dataset = ds.dataset([f.path for f in encontrados], schema=unificado, filesystem=fs, format='parquet')
+    df = dataset.to_table(columns=columnas, filter=_filtro(filtro)).to_pandas()
+    return esquema.dispersar(esquema.compactar(df)) if compacto else df
+
+
+def rangos_recientes(reporte, destino=DATASET, propiedad=None):
+    """
+    Rango más reciente de cada propiedad de un reporte, según sus particiones y nombres de archivo.
+
+    Returns:
+        Diccionario Property -> (Start date, End date), vacío si no hay archivos
+    """
+    rangos = {}
+    for fragmento in fragmentos(reporte, destino, propiedad):
+        claves = ds.get_partition_keys(fragmento.partition_expression)
+        fin = os.path.basename(fragmento.path)[len('part-'):-len('.parquet')]
+        rangos.setdefault(claves.get('property') or '', []).append((fin, claves.get('date') or ''))
+    recientes = {}
+    for p, lista in rangos.items():
+        # Mismo criterio que vistas.rangos_recientes: el que termina más tarde y, entre esos, el más largo
+        fin = max(f for f, _ in lista)
+        recientes[p] = (min(i for f, i in lista if f == fin), fin)
+    return recientes
+
+
+def a_sqlite(tablas, destino=DATASET, propiedad=None):
+    """
+    Carga en una base SQLite en memoria el rango más reciente de cada tabla y propiedad.
+
+    Así vistas.py y los lectores de staging.py funcionan igual sobre el
+    dataset particionado, leyendo solo los archivos de ese rango.
+
+    Returns:
+        Conexión a la base en memoria
+    """
+    conn = sqlite3.connect(':memory:')
+    ingesta.preparar_metadatos(conn)
+    for tabla in tablas:
+        for p, (inicio, fin) in rangos_recientes(tabla, destino, propiedad).items():
+            df = leer(tabla, destino, filtro={'Property': p, 'End date': fin}, propiedad=p or None,
+                      desde=inicio, hasta=inicio, compacto=False)
+            llave = ingesta.FUENTES[tabla][1] if tabla in ingesta.FUENTES else [df.columns[0]]
+            with conn:
+                ingesta.upsert(conn, tabla, df, llave)
+                ingesta.marcar_version(conn, tabla)
+    return conn
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dataset Parquet particionado (Hive) de los exports de GA")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_ingestar = sub.add_parser('ingestar', help="escribe los exports al dataset")
+    p_ingestar.add_argument('--directorio', default='.')
+    p_ingestar.add_argument('--lote', metavar='RAIZ', help="carpeta con una subcarpeta por propiedad y rango")
+    p_ingestar.add_argument('--procesos', type=int, default=None)
+    p_ingestar.add_argument('--completo', action='store_true', help="reescribir todos los exports")
+    p_leer = sub.add_parser('leer', help="lee un reporte con poda de particiones")
+    p_leer.add_argument('reporte')
+    p_leer.add_argument('--propiedad')
+    p_leer.add_argument('--desde', help="Start date mínimo AAAAMMDD")
+    p_leer.add_argument('--hasta', help="Start date máximo AAAAMMDD")
+    p_leer.add_argument('--filtro', action='append', default=[], metavar='COLUMNA=VALOR')
+    for p in (p_ingestar, p_leer):
+        p.add_argument('--destino', default=DATASET, help="carpeta o URI (hdfs://...) del dataset")
+    args = parser.parse_args()
+
+    if args.comando == 'ingestar':
+        escritas = ingestar(args.directorio, args.destino, args.completo, args.lote, args.procesos)
+        for ruta, n in escritas.items():
+            print(f"{ruta}: {n} filas" if n else f"{ruta}: sin cambios")
+    else:
+        filtro = dict(f.split('=', 1) for f in args.filtro) or None
+        df = leer(args.reporte, args.destino, filtro=filtro, propiedad=args.propiedad,
+                  desde=args.desde, hasta=args.hasta)
+        print(df.to_string(index=False) if len(df) < 50 else df)
@@ -0,0 +1,601 @@
+import csv
+import hashlib
+import os
+import pickle
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from datetime import datetime
+
+import instrumentacion
+
+DB_PATH = 'traffic_analysis.db'
+
+# Tabla destino -> (archivo CSV exportado de GA, llave natural dentro de un rango)
+# La primera sección de cada archivo va a la tabla destino; las demás secciones
+# van a '<tabla>__<sección>' con la primera columna como llave natural
+FUENTES = {
+    'audiences':        ('audiences.csv',        ["Audience name"]),
+    'demographics':     ('demographics.csv',     ["Country"]),
+    'engagement':       ('engagement.csv',       ["Nth day"]),
+    'pages':            ('pages.csv',            ["Page path and screen class"]),
+    'reports':          ('reports.csv',          ["Nth day"]),
+    'tech_details':     ('tech_details.csv',     ["Browser"]),
+    'tech_overview':    ('tech_overview.csv',    ["Platform"]),
+    'user_acquisition': ('user_acquisition.csv', ["First user primary channel group (Default Channel Group)"]),
+}
+
+# Columnas que se agregan a cada fila con el rango del encabezado del export
+COLUMNAS_RANGO = ["Start date", "End date"]
+# Llave de cada export: propiedad de GA más el rango (varias propiedades por base)
+COLUMNAS_CLAVE = ["Property"] + COLUMNAS_RANGO
+
+# Filas por transacción del escritor de la ingesta por lotes
+FILAS_POR_TRANSACCION = 200_000
+
+# Claves del encabezado "# Clave: valor" que se guardan tal cual
+CLAVES_ENCABEZADO = ("Account", "Property", "Start date", "End date")
+
+# Filas por DataFrame al leer secciones grandes (memoria acotada)
+FILAS_POR_BLOQUE = 50_000
+
+# Se guarda junto al hash en el manifiesto; al cambiar el lector se vuelve a ingerir todo
+VERSION_LECTOR = 3
+
+
+def _q(nombre):
+    """Entrecomilla un identificador de SQLite."""
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def leer_encabezado(ruta_archivo):
+    """
+    Lee los comentarios iniciales de un export de GA.
+
+    Args:
+        ruta_archivo: Ruta del CSV exportado
+
+    Returns:
+        Diccionario con 'Report', 'Account', 'Property', 'Start date' y 'End date'
+        (solo las claves presentes en el archivo)
+    """
+    meta = {}
+    with open(ruta_archivo, encoding='utf-8') as f:
+        for linea in f:
+            if not linea.startswith('#'):
+                break
+            texto = linea.strip().rstrip(',').lstrip('#').strip()
+            if not texto or texto.startswith('---'):
+                continue
+            clave, sep, valor = texto.partition(':')
+            if sep and clave.strip() in CLAVES_ENCABEZADO:
+                meta.setdefault(clave.strip(), valor.strip())
+            else:
+                meta.setdefault('Report', texto)
+    return meta
+
+
+def _comentario(celdas):
+    """Devuelve (clave, valor) de una línea '# Clave: valor', o (None, texto)."""
+    texto = ",".join(celdas).strip().rstrip(',').lstrip('#').strip()
+    clave, sep, valor = texto.partition(':')
+    if sep and clave.strip() in CLAVES_ENCABEZADO:
+        return clave.strip(), valor.strip()
+    return None, texto
+
+
+def _tipar(filas, columnas):
+    """Construye un DataFrame a partir de celdas de texto y tipa cada columna."""
+    import pandas as pd  # solo al parsear: vistas, series y main.py resumen no cargan pandas
+
+    df = pd.DataFrame(filas, columns=columnas)
+    for col in columnas:
+        valores = df[col].replace('', None)
+        numeros = pd.to_numeric(valores, errors='coerce')
+        # Solo se convierte si todos los valores no vacíos son números
+        if numeros.notna().sum() == valores.notna().sum():
+            df[col] = numeros
+        else:
+            df[col] = valores
+    return df
+
+
+def nombre_seccion(columnas):
+    """Nombre estable de una sección a partir de sus columnas (p.ej. 'operating_system_active_users')."""
+    return re.sub(r'[^0-9a-z]+', '_', " ".join(columnas).lower()).strip('_')
+
+
+def leer_secciones(ruta_archivo, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Lee un export de GA en una sola pasada y lo separa en sus secciones.
+
+    Cada sección empieza con un encabezado de columnas después de líneas '#'
+    (título opcional, 'Start date' y 'End date') y termina en una fila vacía
+    o en el siguiente comentario. Las columnas vacías al final se descartan.
+
+    Args:
+        ruta_archivo: Ruta del CSV exportado
+        filas_por_bloque: Máximo de filas por DataFrame entregado
+
+    Returns:
+        Generador de tuplas (indice_seccion, nombre, meta, DataFrame). Una sección
+        grande se entrega en varios bloques con el mismo índice.
+    """
+    meta_archivo = {}
+    meta = {}
+    columnas = None
+    filas = []
+    indice = -1
+    nombre = None
+    meta_seccion = {}
+    with open(ruta_archivo, encoding='utf-8', newline='') as f:
+        for celdas in csv.reader(f):
+            vacia = not any(c.strip() for c in celdas)
+            comentario = bool(celdas) and celdas[0].startswith('#')
+            if columnas is not None and (vacia or comentario):
+                if filas:
+                    yield indice, nombre, meta_seccion, _tipar(filas, columnas)
+                columnas, filas = None, []
+            if comentario:
+                clave, valor = _comentario(celdas)
+                if clave:
+                    meta[clave] = valor
+                    # Account/Property y el primer rango valen para todo el archivo
+                    meta_archivo.setdefault(clave, valor)
+                elif valor and not valor.startswith('---'):
+                    meta.setdefault('Title', valor)
+                    meta_archivo.setdefault('Report', valor)
+                continue
+            if vacia:
+                continue
+            if columnas is None:
+                columnas = [c.strip() for c in celdas]
+                while columnas and not columnas[-1]:
+                    columnas.pop()
+                indice += 1
+                nombre = nombre_seccion(columnas)
+                # El título solo aplica a la sección que le sigue
+                meta_seccion = {**meta_archivo, **meta}
+                meta.pop('Title', None)
+                continue
+            filas.append(celdas[:len(columnas)] + [''] * (len(columnas) - len(celdas)))
+            if len(filas) >= filas_por_bloque:
+                yield indice, nombre, meta_seccion, _tipar(filas, columnas)
+                filas = []
+        if columnas is not None and filas:
+            yield indice, nombre, meta_seccion, _tipar(filas, columnas)
+
+
+def hash_archivo(ruta_archivo, bloque=1 << 20):
+    """Calcula el sha256 de un archivo leyéndolo por bloques."""
+    h = hashlib.sha256()
+    with open(ruta_archivo, 'rb') as f:
+        for trozo in iter(lambda: f.read(bloque), b''):
+            h.update(trozo)
+    return h.hexdigest()
+
+
+def preparar_metadatos(conn):
+    """Crea las tablas internas de manifiesto, versiones y cambios si no existen."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _manifest (
+            archivo    TEXT PRIMARY KEY,
+            tabla      TEXT,
+            hash       TEXT,
+            mtime      REAL,
+            tamano     INTEGER,
+            start_date TEXT,
+            end_date   TEXT,
+            filas      INTEGER,
+            ingestado  TEXT
+        )""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _versiones (
+            tabla       TEXT PRIMARY KEY,
+            version     INTEGER,
+            actualizado TEXT
+        )""")
+    # Rangos escritos en cada versión; rango NULL significa que cambió la tabla completa
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _cambios (
+            tabla      TEXT,
+            version    INTEGER,
+            start_date TEXT,
+            end_date   TEXT
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix__cambios ON _cambios (tabla, version)")
+    # Identidad de la base: las versiones reinician en 1 si la base se borra y se
+    # vuelve a crear, la generación no (la usa el caché columnar en su clave)
+    conn.execute("CREATE TABLE IF NOT EXISTS _generacion (uuid TEXT, creada TEXT)")
+    # (se revisa antes de insertar para que las conexiones de solo lectura no escriban)
+    if conn.execute("SELECT 1 FROM _generacion").fetchone() is None:
+        conn.execute("INSERT INTO _generacion VALUES (?, ?)",
+                     (uuid.uuid4().hex, datetime.now().isoformat(timespec='seconds')))
+
+
+def marcar_version(conn, tabla, rangos=None):
+    """
+    Incrementa la versión de una tabla para que cachés y vistas sepan que cambió.
+
+    Args:
+        conn: Conexión a SQLite
+        tabla: Tabla modificada
+        rangos: Pares (Start date, End date) escritos; None si cambió toda la tabla
+
+    Returns:
+        La nueva versión de la tabla
+    """
+    conn.execute("""
+        INSERT INTO _versiones (tabla, version, actualizado) VALUES (?, 1, ?)
+        ON CONFLICT(tabla) DO UPDATE SET version = version + 1, actualizado = excluded.actualizado
+    """, (tabla, datetime.now().isoformat(timespec='seconds')))
+    version = conn.execute("SELECT version FROM _versiones WHERE tabla = ?", (tabla,)).fetchone()[0]
+    conn.executemany("INSERT INTO _cambios (tabla, version, start_date, end_date) VALUES (?, ?, ?, ?)",
+                     [(tabla, version, inicio, fin) for inicio, fin in (rangos or [(None, None)])])
+    return version
+
+
+def _existe(conn, tabla):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (tabla,)).fetchone() is not None
+
+
+def version_tabla(conn, tabla):
+    """Devuelve la versión actual de una tabla (0 si nunca se ha escrito). No escribe en la base."""
+    if not _existe(conn, '_versiones'):
+        return 0
+    fila = conn.execute("SELECT version FROM _versiones WHERE tabla = ?", (tabla,)).fetchone()
+    return fila[0] if fila else 0
+
+
+def generacion_base(conn):
+    """Devuelve el identificador único de la base (None si aún no tiene metadatos). No escribe en la base."""
+    if not _existe(conn, '_generacion'):
+        return None
+    fila = conn.execute("SELECT uuid FROM _generacion").fetchone()
+    return fila[0] if fila else None
+
+
+def _estado_manifest(conn, ruta_archivo):
+    """
+    Compara un archivo contra su entrada del manifiesto.
+
+    Returns:
+        Tupla (sin_cambios, hash, stat). El hash solo se calcula si cambió mtime o tamaño.
+    """
+    st = os.stat(ruta_archivo)
+    fila = conn.execute("SELECT hash, mtime, tamano FROM _manifest WHERE archivo = ?",
+                        (ruta_archivo,)).fetchone()
+    prefijo = f"v{VERSION_LECTOR}:"
+    if fila is not None and fila[0].startswith(prefijo) and fila[1] == st.st_mtime and fila[2] == st.st_size:
+        return True, fila[0], st
+    h = prefijo + hash_archivo(ruta_archivo)
+    return fila is not None and fila[0] == h, h, st
+
+
+def _columnas_tabla(conn, tabla):
+    return [fila[1] for fila in conn.execute(f"PRAGMA table_info({_q(tabla)})")]
+
+
+def _preparar_tabla(conn, tabla, df, llave):
+    """Crea la tabla (o agrega columnas nuevas) y su índice único sobre la llave natural."""
+    existentes = _columnas_tabla(conn, tabla)
+    # Tablas del esquema anterior (sin propiedad/rango o con columnas "Unnamed: N"
+    # del lector que mezclaba secciones) se reconstruyen desde cero
+    legado = any(c.startswith("Unnamed: ") for c in existentes)
+    if existentes and (legado or not set(COLUMNAS_CLAVE) <= set(existentes)):
+        conn.execute(f"DROP TABLE {_q(tabla)}")
+        existentes = []
+    if not existentes:
+        df.head(0).to_sql(tabla, conn, index=False)
+    else:
+        for col in df.columns:
+            if col not in existentes:
+                conn.execute(f"ALTER TABLE {_q(tabla)} ADD COLUMN {_q(col)}")
+    if llave:
+        cols = ", ".join(_q(c) for c in llave + COLUMNAS_CLAVE)
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {_q('ux_' + tabla)} ON {_q(tabla)} ({cols})")
+    else:
+        cols = ", ".join(_q(c) for c in COLUMNAS_CLAVE)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {_q('ix_' + tabla + '_rango')} ON {_q(tabla)} ({cols})")
+
+
+def upsert(conn, tabla, df, llave=None):
+    """
+    Inserta un DataFrame en una tabla de SQLite sin reescribirla completa.
+
+    Args:
+        conn: Conexión a SQLite
+        tabla: Nombre de la tabla destino
+        df: DataFrame que ya incluye las columnas de COLUMNAS_CLAVE
+        llave: Columnas de la llave natural (None para reemplazar propiedad y rango completos)
+
+    Returns:
+        Número de filas escritas
+    """
+    with instrumentacion.span(f"upsert:{tabla}", filas=len(df)):
+        return _upsert(conn, tabla, df, llave)
+
+
+def _upsert(conn, tabla, df, llave):
+    _preparar_tabla(conn, tabla, df, llave)
+    if not llave:
+        claves = df[COLUMNAS_CLAVE].drop_duplicates().itertuples(index=False, name=None)
+        filtro = " AND ".join(f"{_q(c)} IS ?" for c in COLUMNAS_CLAVE)
+        conn.executemany(f"DELETE FROM {_q(tabla)} WHERE {filtro}", list(claves))
+    cols = ", ".join(_q(c) for c in df.columns)
+    marcas = ", ".join("?" for _ in df.columns)
+    verbo = "INSERT OR REPLACE" if llave else "INSERT"
+    filas = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    conn.executemany(f"{verbo} INTO {_q(tabla)} ({cols}) VALUES ({marcas})", filas)
+    return len(df)
+
+
+def _borrar_rango(conn, tabla, clave):
+    """Borra las filas de una propiedad y rango (valores de COLUMNAS_CLAVE) si la tabla ya existe."""
+    if set(COLUMNAS_CLAVE) <= set(_columnas_tabla(conn, tabla)):
+        filtro = " AND ".join(f"{_q(c)} IS ?" for c in COLUMNAS_CLAVE)
+        conn.execute(f"DELETE FROM {_q(tabla)} WHERE {filtro}", clave)
+
+
+def _escribir_archivo(conn, tabla, llave, ruta, h, st, meta, secciones, completo=False):
+    """
+    Escribe las secciones de un export y actualiza versiones y manifiesto.
+
+    No hace commit: quien llama decide el tamaño de la transacción.
+
+    Returns:
+        Número de filas escritas
+    """
+    total = 0
+    tocadas = {}
+    for indice, seccion, meta_seccion, df in secciones:
+        destino = tabla if indice == 0 else f"{tabla}__{seccion}"
+        for col in COLUMNAS_CLAVE:
+            # '' en lugar de NULL: los índices únicos de SQLite no igualan NULLs
+            df[col] = meta_seccion.get(col) or ''
+        if destino not in tocadas:
+            # Un export reemplaza completo su propiedad y rango: las filas que ya no
+            # vienen (p.ej. un país que desapareció) se borran antes del primer bloque
+            _borrar_rango(conn, destino, df[COLUMNAS_CLAVE].iloc[0].tolist())
+        total += upsert(conn, destino, df, llave if indice == 0 else [df.columns[0]])
+        tocadas.setdefault(destino, set()).update(
+            df[COLUMNAS_RANGO].drop_duplicates().itertuples(index=False, name=None))
+    for destino, rangos in tocadas.items():
+        marcar_version(conn, destino, None if completo else sorted(rangos))
+    conn.execute("""
+        INSERT OR REPLACE INTO _manifest
+            (archivo, tabla, hash, mtime, tamano, start_date, end_date, filas, ingestado)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (ruta, tabla, h, st.st_mtime, st.st_size, meta.get('Start date'),
+          meta.get('End date'), total, datetime.now().isoformat(timespec='seconds')))
+    return total
+
+
+def _borrar_tablas(conn, tablas):
+    """Borra las tablas dadas junto con sus tablas de sección ('<tabla>__...')."""
+    nombres = [n for (n,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    for nombre in nombres:
+        if nombre in tablas or nombre.split('__')[0] in tablas:
+            conn.execute(f"DROP TABLE {_q(nombre)}")
+
+
+def ingestar(conn, directorio='.', forzar=False):
+    """
+    Ingesta incremental e idempotente de los exports de GA a SQLite.
+
+    Los archivos cuyo hash no cambió desde la última corrida se saltan; los
+    demás se agregan por propiedad y rango de fechas con upsert sobre la llave natural.
+
+    Args:
+        conn: Conexión a SQLite
+        directorio: Carpeta donde están los CSV
+        forzar: Si es True se borran las tablas y se vuelve a cargar todo
+
+    Returns:
+        Diccionario tabla -> filas escritas (0 si el archivo no cambió)
+    """
+    preparar_metadatos(conn)
+    escritas = {}
+    for tabla, (archivo, llave) in FUENTES.items():
+        ruta = os.path.join(directorio, archivo)
+        if not os.path.exists(ruta):
+            continue
+        sin_cambios, h, st = _estado_manifest(conn, ruta)
+        if sin_cambios and not forzar:
+            # Mismo contenido con otro mtime (p.ej. copiado): se actualiza para no rehashear
+            with conn:
+                conn.execute("UPDATE _manifest SET mtime = ?, tamano = ? WHERE archivo = ?",
+                             (st.st_mtime, st.st_size, ruta))
+            escritas[tabla] = 0
+            continue
+        with conn, instrumentacion.span(f"ingesta:{archivo}", bytes=st.st_size) as s:
+            if forzar:
+                _borrar_tablas(conn, {tabla})
+                # Los exports de esta tabla que vinieron de otras carpetas también se perdieron
+                conn.execute("DELETE FROM _manifest WHERE tabla = ?", (tabla,))
+            escritas[tabla] = s['filas'] = _escribir_archivo(
+                conn, tabla, llave, ruta, h, st, leer_encabezado(ruta), leer_secciones(ruta), completo=forzar)
+    return escritas
+
+
+def buscar_exports(raiz):
+    """
+    Recorre un árbol de carpetas (una por propiedad y rango) buscando exports de GA.
+
+    Returns:
+        Lista de tuplas (tabla, ruta) para los archivos con nombre conocido en FUENTES
+    """
+    por_archivo = {archivo: tabla for tabla, (archivo, _) in FUENTES.items()}
+    encontrados = []
+    for carpeta, _, archivos in os.walk(raiz):
+        for archivo in sorted(archivos):
+            if archivo in por_archivo:
+                encontrados.append((por_archivo[archivo], os.path.join(carpeta, archivo)))
+    return sorted(encontrados, key=lambda x: x[1])
+
+
+def _parsear_export(tabla, ruta, hash_previo, carpeta):
+    """
+    Trabajo de un proceso del pool: hashea y parsea un export.
+
+    Los bloques de leer_secciones se van escribiendo a un archivo temporal en
+    `carpeta` en vez de devolverse, así ni el proceso ni el escritor tienen el
+    export completo en memoria (ver _leer_temporal).
+
+    Returns:
+        Tupla (tabla, ruta, hash, stat, meta, temporal); temporal es None si el
+        contenido es igual al del manifiesto
+    """
+    st = os.stat(ruta)
+    h = f"v{VERSION_LECTOR}:" + hash_archivo(ruta)
+    if h == hash_previo:
+        return tabla, ruta, h, st, None, None
+    fd, temporal = tempfile.mkstemp(suffix='.pkl', dir=carpeta)
+    with os.fdopen(fd, 'wb') as f:
+        for bloque in leer_secciones(ruta):
+            pickle.dump(bloque, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return tabla, ruta, h, st, leer_encabezado(ruta), temporal
+
+
+def _leer_temporal(temporal):
+    """Bloques (índice, sección, meta, DataFrame) que escribió _parsear_export, uno a la vez."""
+    with open(temporal, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _escritor(db_path, cola, completo, escritas, errores):
+    """Único escritor de SQLite: consume exports parseados de la cola en transacciones grandes."""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        pendientes = 0
+        while True:
+            item = cola.get()
+            if item is None:
+                break
+            tabla, ruta, h, st, meta, temporal = item
+            if temporal is None:
+                conn.execute("UPDATE _manifest SET mtime = ?, tamano = ? WHERE archivo = ?",
+                             (st.st_mtime, st.st_size, ruta))
+                escritas[ruta] = 0
+                continue
+            escritas[ruta] = _escribir_archivo(conn, tabla, FUENTES[tabla][1], ruta, h, st, meta,
+                                               _leer_temporal(temporal), completo=completo)
+            os.remove(temporal)
+            pendientes += escritas[ruta]
+            # Se hace commit por volumen, o cuando ya no hay nada esperando en la cola
+            if pendientes >= FILAS_POR_TRANSACCION or cola.empty():
+                conn.commit()
+                pendientes = 0
+        conn.commit()
+    except Exception as error:
+        conn.rollback()
+        errores.append(error)
+        # Se vacía la cola para no bloquear a quien produce
+        while cola.get() is not None:
+            pass
+    finally:
+        conn.close()
+
+
+def ingestar_lote(raiz, db_path=DB_PATH, procesos=None, forzar=False):
+    """
+    Ingesta en paralelo de los exports de muchas propiedades.
+
+    Los archivos se hashean y parsean en un pool de procesos que deja los
+    bloques en archivos temporales; estos pasan por una cola a un solo hilo
+    escritor con la base en modo WAL, así que nunca hay dos escritores peleando
+    por el lock de SQLite. La memoria queda acotada por el tamaño de bloque y por
+    el número de trabajos en vuelo, no por el tamaño de los exports. Cada fila
+    lleva la propiedad y el rango de su encabezado (COLUMNAS_CLAVE).
+
+    Args:
+        raiz: Carpeta raíz con una subcarpeta por propiedad y rango
+        db_path: Ruta de la base SQLite
+        procesos: Número de procesos para parsear (None = núcleos disponibles)
+        forzar: Si es True se borran las tablas y se vuelve a cargar todo
+
+    Returns:
+        Diccionario ruta -> filas escritas (0 si el archivo no cambió)
+    """
+    conn = sqlite3.connect(db_path)
+    with conn:
+        preparar_metadatos(conn)
+        if forzar:
+            _borrar_tablas(conn, set(FUENTES))
+            # Sin las tablas, ninguna entrada del manifiesto es válida (también las de otras raíces)
+            conn.execute("DELETE FROM _manifest")
+        manifiesto = dict(conn.execute("SELECT archivo, hash FROM _manifest").fetchall())
+        estado = {archivo: (mtime, tamano) for archivo, mtime, tamano
+                  in conn.execute("SELECT archivo, mtime, tamano FROM _manifest")}
+    conn.close()
+
+    escritas, errores = {}, []
+    trabajos = []
+    prefijo = f"v{VERSION_LECTOR}:"
+    for tabla, ruta in buscar_exports(raiz):
+        st = os.stat(ruta)
+        previo = manifiesto.get(ruta)
+        if not forzar and previo and previo.startswith(prefijo) and estado[ruta] == (st.st_mtime, st.st_size):
+            escritas[ruta] = 0
+            continue
+        trabajos.append((tabla, ruta, None if forzar else previo))
+
+    en_vuelo = 2 * (procesos or os.cpu_count() or 1)
+    cola = queue.Queue(maxsize=en_vuelo)
+    hilo = threading.Thread(target=_escritor, args=(db_path, cola, forzar, escritas, errores))
+    with tempfile.TemporaryDirectory(prefix='ingesta-', dir=os.path.dirname(os.path.abspath(db_path))) as carpeta:
+        hilo.start()
+        try:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                # A lo más `en_vuelo` exports parseados esperando al escritor
+                futuros = set()
+                for trabajo in trabajos:
+                    if len(futuros) >= en_vuelo:
+                        hechos, futuros = wait(futuros, return_when=FIRST_COMPLETED)
+                        for futuro in hechos:
+                            cola.put(futuro.result())
+                    futuros.add(pool.submit(_parsear_export, *trabajo, carpeta))
+                for futuro in as_completed(futuros):
+                    cola.put(futuro.result())
+        finally:
+            cola.put(None)
+            hilo.join()
+    if errores:
+        raise errores[0]
+    return escritas
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Ingesta de exports de GA a SQLite")
+    parser.add_argument('--completo', action='store_true', help="reconstruir todas las tablas")
+    parser.add_argument('--lote', metavar='RAIZ', help="carpeta con una subcarpeta por propiedad y rango")
+    parser.add_argument('--procesos', type=int, default=None, help="procesos para parsear en modo lote")
+    args = parser.parse_args()
+
+    if args.lote:
+        escritas = ingestar_lote(args.lote, procesos=args.procesos, forzar=args.completo)
+        cambiados = {r: n for r, n in escritas.items() if n}
+        print(f"{len(escritas)} archivos, {len(cambiados)} con cambios, {sum(cambiados.values())} filas")
+        conexion = sqlite3.connect(DB_PATH)
+    else:
+        conexion = sqlite3.connect(DB_PATH)
+        for nombre, n in ingestar(conexion, forzar=args.completo).items():
+            print(f"{nombre}: {n} filas" if n else f"{nombre}: sin cambios")
+    import series
+    import vistas
+    for nombre, estado in vistas.refrescar_vistas(conexion).items():
+        print(f"{nombre}: {estado}")
+    series.actualizar_series(conexion)
+    conexion.close()
@@ -0,0 +1,297 @@
+import argparse
+import atexit
+import functools
+import os
+import resource
+import runpy
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Se activa con WEBVIEW_INSTRUMENTAR=1 (o corriendo un script con este módulo,
+# ver __main__). Apagado, span() e instrumentado() no hacen nada.
+HABILITADO = os.environ.get('WEBVIEW_INSTRUMENTAR') == '1'
+# Archivo Chrome trace (chrome://tracing, Perfetto) que se escribe al salir
+TRAZA = os.environ.get('WEBVIEW_TRAZA')
+# Perfilado opcional: 'cprofile' o 'tracemalloc'
+PERFIL = os.environ.get('WEBVIEW_PERFIL')
+PERFIL_SALIDA = os.environ.get('WEBVIEW_PERFIL_SALIDA', 'perfil.prof')
+# Líneas que se imprimen del reporte de cProfile/tracemalloc
+TOP_PERFIL = 25
+# Segundos entre muestras de RSS mientras hay spans abiertos
+INTERVALO_RSS = 0.005
+
+_spans = []
+_contadores = {}
+_lock = threading.Lock()
+_inicio = time.perf_counter()
+_corrida = f"{datetime.now().isoformat(timespec='seconds')}-{os.getpid()}"
+_perfilador = None
+_activo = False
+# Pico de RSS de cada span abierto (los actualiza el hilo de _muestrear_rss)
+_abiertos = {}
+_muestreador = None
+
+
+def rss_mb():
+    """RSS actual del proceso en MB (fuera de Linux, el pico de todo el proceso)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _maxrss_mb():
+    """Pico de RSS de todo el proceso en MB (ru_maxrss viene en KB en Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _muestrear_rss():
+    """Hilo de fondo: muestrea el RSS y sube el pico de los spans abiertos."""
+    while True:
+        time.sleep(INTERVALO_RSS)
+        if not _abiertos:
+            continue
+        actual = rss_mb()
+        with _lock:
+            for pico in _abiertos.values():
+                pico[0] = max(pico[0], actual)
+
+
+def _tamano(valor):
+    """(filas, bytes) de un resultado con forma de tabla (DataFrame, ndarray); si no, (None, None)."""
+    forma = getattr(valor, 'shape', None)
+    if not forma:
+        return None, None
+    uso = getattr(valor, 'memory_usage', None)
+    if callable(uso):
+        return forma[0], int(uso(index=False).sum())
+    return forma[0], getattr(valor, 'nbytes', None)
+
+
+@contextmanager
+def span(nombre, **atributos):
+    """
+    Mide un bloque de código.
+
+    El diccionario que entrega el with se puede completar con 'filas' y
+    'bytes' (u otros atributos) para que queden en la traza y en el resumen.
+
+    Args:
+        nombre: Nombre del span (p.ej. 'read_sql:mv_pages')
+        **atributos: Atributos iniciales del span
+    """
+    if not HABILITADO:
+        yield atributos
+        return
+    global _muestreador
+    # El pico del span sale de muestras periódicas del RSS y, si el pico de todo el
+    # proceso (ru_maxrss) subió mientras estaba abierto, de ese nuevo pico exacto
+    pico = [rss_mb()]
+    maxrss = _maxrss_mb()
+    with _lock:
+        _abiertos[id(pico)] = pico
+        if _muestreador is None:
+            _muestreador = threading.Thread(target=_muestrear_rss, name='instrumentacion-rss', daemon=True)
+            _muestreador.start()
+    inicio = time.perf_counter()
+    try:
+        yield atributos
+    finally:
+        fin = time.perf_counter()
+        final, maxrss_final = rss_mb(), _maxrss_mb()
+        with _lock:
+            del _abiertos[id(pico)]
+            rss = max(pico[0], final, maxrss_final if maxrss_final > maxrss else 0)
+            _spans.append((nombre, inicio, fin - inicio, threading.get_ident(), rss, atributos))
+
+
+def instrumentado(nombre=None):
+    """
+    Decorador: un span por llamada, con filas y bytes del resultado si es una tabla.
+
+    Args:
+        nombre: Nombre del span (por defecto 'modulo.funcion')
+    """
+    def decorador(fn):
+        etiqueta = nombre or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            if not HABILITADO:
+                return fn(*args, **kwargs)
+            with span(etiqueta) as s:
+                resultado = fn(*args, **kwargs)
+                # Los que devuelven (df, mascara, ...) cuentan la primera tabla
+                tabla = resultado[0] if isinstance(resultado, tuple) and resultado else resultado
+                filas, tamano = _tamano(tabla)
+                if filas is not None:
+                    s.setdefault('filas', filas)
+                    s.setdefault('bytes', tamano)
+            return resultado
+        return envoltura
+    return decorador
+
+
+def contar(nombre, n=1):
+    """Suma n al contador `nombre`."""
+    if not HABILITADO:
+        return
+    with _lock:
+        _contadores[nombre] = _contadores.get(nombre, 0) + n
+
+
+def resumen():
+    """
+    Agrega los spans de esta corrida por nombre.
+
+    Returns:
+        Diccionario nombre -> {'llamadas', 'segundos', 'segundos_max', 'filas', 'bytes', 'rss_max_mb'}
+    """
+    agregado = {}
+    with _lock:
+        spans = list(_spans)
+    for nombre, _, duracion, _, rss, atributos in spans:
+        a = agregado.setdefault(nombre, {'llamadas': 0, 'segundos': 0.0, 'segundos_max': 0.0,
+                                         'filas': 0, 'bytes': 0, 'rss_max_mb': 0.0})
+        a['llamadas'] += 1
+        a['segundos'] += duracion
+        a['segundos_max'] = max(a['segundos_max'], duracion)
+        a['filas'] += atributos.get('filas') or 0
+        a['bytes'] += atributos.get('bytes') or 0
+        a['rss_max_mb'] = max(a['rss_max_mb'], rss)
+    return agregado
+
+
+def exportar_traza(ruta):
+    """Escribe los spans y contadores como Chrome trace JSON (eventos completos 'X')."""
+    import json
+
+    pid = os.getpid()
+    with _lock:
+        spans, contadores = list(_spans), dict(_contadores)
+    eventos = [{'name': nombre, 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': round((inicio - _inicio) * 1e6, 1), 'dur': round(duracion * 1e6, 1),
+                'args': {**{k: v for k, v in atributos.items() if v is not None}, 'rss_max_mb': round(rss, 1)}}
+               for nombre, inicio, duracion, tid, rss, atributos in spans]
+    fin = round((time.perf_counter() - _inicio) * 1e6, 1)
+    eventos += [{'name': nombre, 'ph': 'C', 'pid': pid, 'ts': fin, 'args': {'valor': valor}}
+                for nombre, valor in contadores.items()]
+    with open(ruta, 'w') as f:
+        json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f)
+
+
+def guardar_resumen(conn):
+    """
+    Guarda el resumen de esta corrida en la tabla _instrumentacion.
+
+    Args:
+        conn: Conexión a SQLite
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _instrumentacion (
+            corrida      TEXT,
+            span         TEXT,
+            llamadas     INTEGER,
+            segundos     REAL,
+            segundos_max REAL,
+            filas        INTEGER,
+            bytes        INTEGER,
+            rss_max_mb   REAL,
+            PRIMARY KEY (corrida, span)
+        )""")
+    filas = [(_corrida, nombre, a['llamadas'], a['segundos'], a['segundos_max'],
+              a['filas'], a['bytes'], a['rss_max_mb']) for nombre, a in resumen().items()]
+    with _lock:
+        filas += [(_corrida, f"contador:{nombre}", valor, None, None, None, None, None)
+                  for nombre, valor in _contadores.items()]
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO _instrumentacion VALUES (?, ?, ?, ?, ?, ?, ?, ?)", filas)
+
+
+def _iniciar_perfil():
+    global _perfilador
+    if PERFIL == 'cprofile':
+        import cProfile
+        _perfilador = cProfile.Profile()
+        _perfilador.enable()
+    elif PERFIL == 'tracemalloc':
+        import tracemalloc
+        tracemalloc.start(10)
+
+
+def _terminar_perfil():
+    if PERFIL == 'cprofile' and _perfilador is not None:
+        import pstats
+        _perfilador.disable()
+        _perfilador.dump_stats(PERFIL_SALIDA)
+        pstats.Stats(_perfilador, stream=sys.stderr).sort_stats('cumulative').print_stats(TOP_PERFIL)
+        print(f"Perfil guardado en {PERFIL_SALIDA}", file=sys.stderr)
+    elif PERFIL == 'tracemalloc':
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            actual, pico = tracemalloc.get_traced_memory()
+            print(f"tracemalloc: actual {actual / 2**20:.1f} MB, pico {pico / 2**20:.1f} MB", file=sys.stderr)
+            for estadistica in tracemalloc.take_snapshot().statistics('lineno')[:TOP_PERFIL]:
+                print(estadistica, file=sys.stderr)
+            tracemalloc.stop()
+
+
+def _al_salir():
+    """Exporta la traza y el resumen de la corrida (solo el proceso principal: los
+    procesos de los pools terminan sin pasar por atexit)."""
+    _terminar_perfil()
+    if not _spans:
+        return
+    if TRAZA:
+        exportar_traza(TRAZA)
+    import sqlite3
+
+    import ingesta
+    conn = sqlite3.connect(ingesta.DB_PATH)
+    guardar_resumen(conn)
+    conn.close()
+    print(f"Instrumentación: {len(_spans)} spans guardados en _instrumentacion (corrida {_corrida})",
+          file=sys.stderr)
+
+
+def activar(traza=None, perfil=None):
+    """Activa la instrumentación en este proceso (equivale a las variables WEBVIEW_*)."""
+    global HABILITADO, TRAZA, PERFIL, _activo
+    TRAZA = traza or TRAZA
+    PERFIL = perfil or PERFIL
+    HABILITADO = True
+    if not _activo:
+        _activo = True
+        _iniciar_perfil()
+        atexit.register(_al_salir)
+
+
+if HABILITADO and __name__ != "__main__":
+    activar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Corre un script del proyecto con instrumentación, p.ej. "
+                    "python instrumentacion.py --traza traza.json main.py resumen")
+    parser.add_argument('--traza', help="archivo Chrome trace JSON")
+    parser.add_argument('--perfil', choices=['cprofile', 'tracemalloc'])
+    parser.add_argument('script')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    # Se activa por variables de entorno: así la copia importable del módulo (la que
+    # usan los demás, distinta de este __main__) queda activa desde su import
+    os.environ['WEBVIEW_INSTRUMENTAR'] = '1'
+    if args.traza:
+        os.environ['WEBVIEW_TRAZA'] = args.traza
+    if args.perfil:
+        os.environ['WEBVIEW_PERFIL'] = args.perfil
+    sys.argv = [args.script, *args.args]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    import instrumentacion  # noqa: F401
+    runpy.run_path(args.script, run_name='__main__')
@@ -1,158 +1,275 @@
+import argparse
 import sqlite3
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+# pandas, matplotlib y seaborn se importan dentro de las funciones que los usan:
+# el modo "resumen" solo necesita sqlite3 y arranca en una fracción del tiempo
+import ingesta
+import instrumentacion
+import vistas
+
+TABLAS = ['audiences', 'demographics', 'engagement', 'pages',
+          'reports', 'tech_details', 'tech_overview', 'user_acquisition']
+
+# Totales que imprime el modo resumen (rango de fechas más reciente de cada tabla)
+TOTALES_RESUMEN = {
+    'audiences': ["Total users", "New users"],
+    'demographics': ["Active users", "New users", "Engaged sessions"],
+    'pages': ["Views", "Active users", "Event count"],
+    'tech_details': ["Active users"],
+    'tech_overview': ["Active users"],
+    'user_acquisition': ["Total users"],
+}
+
 
 # 2. Crear o conectar a la base de datos SQLite en el mismo environment
 #    Esto crea un archivo 'traffic_analysis.db' en el directorio actual
-conn = sqlite3.connect('traffic_analysis.db')
-cursor = conn.cursor()
-
-# 3. Leer archivos CSV (omitimos líneas de comentario que empiezan con '#')
-audiences_df       = pd.read_csv('audiences.csv', comment='#')
-demographics_df    = pd.read_csv('demographics.csv', comment='#')
-engagement_df      = pd.read_csv('engagement.csv', comment='#')
-pages_df           = pd.read_csv('pages.csv', comment='#')
-reports_df         = pd.read_csv('reports.csv', comment='#')
-tech_details_df    = pd.read_csv('tech_details.csv', comment='#')
-tech_overview_df   = pd.read_csv('tech_overview.csv', comment='#')
-user_acquisition_df= pd.read_csv('user_acquisition.csv', comment='#')
-
-# 4. Guardar DataFrames como tablas en la base de datos SQLite
-audiences_df.to_sql('audiences',       conn, if_exists='replace', index=False)
-demographics_df.to_sql('demographics',   conn, if_exists='replace', index=False)
-engagement_df.to_sql('engagement',       conn, if_exists='replace', index=False)
-pages_df.to_sql('pages',                 conn, if_exists='replace', index=False)
-reports_df.to_sql('reports',             conn, if_exists='replace', index=False)
-tech_details_df.to_sql('tech_details',   conn, if_exists='replace', index=False)
-tech_overview_df.to_sql('tech_overview', conn, if_exists='replace', index=False)
-user_acquisition_df.to_sql('user_acquisition', conn, if_exists='replace', index=False)
-conn.commit()
+def conectar():
+    return sqlite3.connect(ingesta.DB_PATH)
+
+
+# 3-4. Ingesta incremental: solo se escriben los CSV que cambiaron desde la última
+#      corrida (ver ingesta.py). Con --completo se reconstruyen todas las tablas.
+def actualizar(conn, forzar=False):
+    import series
+
+    escritas = ingesta.ingestar(conn, forzar=forzar)
+    for table, filas in escritas.items():
+        print(f"Tabla '{table}': {filas} filas escritas" if filas else f"Tabla '{table}': sin cambios")
+    # Vistas materializadas para el dashboard (solo se recalculan los rangos que cambiaron)
+    for vista, estado in vistas.refrescar_vistas(conn).items():
+        print(f"Vista '{vista}': {estado}")
+    # Series diarias con fecha absoluta a partir de las secciones "Nth day" (ver series.py)
+    series.actualizar_series(conn)
+
+
+# Modo aproximado: distintos, top-K y describe() desde los bosquejos guardados en
+# SQLite (ver modelado.actualizar_bosquejos), en memoria constante
+def resumen_aproximado(conn, propiedad=None, desde=None, hasta=None):
+    import modelado
+
+    modelado.actualizar_bosquejos(conn)
+    for tabla in modelado.BOSQUEJOS:
+        resultado = modelado.resumen_aproximado(conn, tabla, propiedad, desde, hasta)
+        if resultado is None:
+            print(f"Tabla '{tabla}': sin bosquejos")
+            continue
+        distintos, error = resultado['distintos']
+        estadisticas, errores = resultado['describe']
+        print(f"Tabla '{tabla}': ~{distintos:,.0f} ± {error:,.0f} '{modelado.BOSQUEJOS[tabla][0]}' distintos")
+        print(resultado['top'].to_string(index=False))
+        print(estadisticas.round(2).astype(str).add(" ± ").add(errores.round(2).astype(str)).to_string())
+
 
 # 5. (Opcional) Volver a cargar las tablas desde SQLite para verificar integridad
 #    y trabajar con ellas en downstream
-table_names = ['audiences', 'demographics', 'engagement', 'pages',
-               'reports', 'tech_details', 'tech_overview', 'user_acquisition']
-
-dfs = {}
-for table in table_names:
-    dfn = pd.read_sql_query(f"SELECT * FROM {table}", conn)
-    dfs[f"{table}_df"] = dfn
-    print(f"Tabla '{table}' cargada: {dfn.shape[0]} filas x {dfn.shape[1]} columnas")
-
-# 6. Asignar variables finales para uso en análisis posterior
-audiences_df       = dfs['audiences_df']
-demographics_df    = dfs['demographics_df']
-engagement_df      = dfs['engagement_df']
-pages_df           = dfs['pages_df']
-reports_df         = dfs['reports_df']
-tech_details_df    = dfs['tech_details_df']
-tech_overview_df   = dfs['tech_overview_df']
-user_acquisition_df= dfs['user_acquisition_df']
-
-print("Audiences:")
-print(audiences_df.head())
-
-print("Demographics:")
-print(demographics_df.head())
-
-print("Engagement Overview:")
-print(engagement_df.head())
+def cargar_tablas(conn, dataset=None):
+    import esquema
+
+    dfs = {}
+    for table in TABLAS:
+        # Dimensiones como category y métricas como int32/float32 (ver esquema.py)
+        if dataset:
+            import hadoopIns
+            dfn = hadoopIns.leer(table, dataset)
+        else:
+            dfn = esquema.leer_tabla(conn, table)
+        dfs[f"{table}_df"] = dfn
+        print(f"Tabla '{table}' cargada: {dfn.shape[0]} filas x {dfn.shape[1]} columnas")
+    return dfs
+
 
 #7- convierte columnas
+@instrumentacion.instrumentado('main.convert_numeric')
 def convert_numeric(df, cols):
+    import pandas as pd
+
     for col in cols:
-        if col in df.columns:
+        # Las tablas ya vienen tipadas desde ingesta.py; solo se coercionan las que no
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
             df[col] = pd.to_numeric(df[col], errors='coerce')
     return df
 
-#convierte columnas a DataFrame de Audiences
-audiences_df = convert_numeric(audiences_df, ["Total users", "New users", "Sessions", "Views per session", "Average session duration", "Total revenue"])
-
-#convierte columnas a DataFrame de Audiences
-demographics_df = convert_numeric(demographics_df, ["Active users", "New users", "Engaged sessions", "Event count", "Total revenue"])
 
 #8- Crea gráficas
+def graficar(dfs):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # 6. Asignar variables finales para uso en análisis posterior
+    audiences_df       = dfs['audiences_df']
+    demographics_df    = dfs['demographics_df']
+    engagement_df      = dfs['engagement_df']
+    tech_details_df    = dfs['tech_details_df']
+    tech_overview_df   = dfs['tech_overview_df']
+    user_acquisition_df= dfs['user_acquisition_df']
+
+    print("Audiences:")
+    print(audiences_df.head())
+
+    print("Demographics:")
+    print(demographics_df.head())
+
+    print("Engagement Overview:")
+    print(engagement_df.head())
+
+    #convierte columnas a DataFrame de Audiences
+    audiences_df = convert_numeric(audiences_df, ["Total users", "New users", "Sessions", "Views per session", "Average session duration", "Total revenue"])
+
+    #convierte columnas a DataFrame de Audiences
+    demographics_df = convert_numeric(demographics_df, ["Active users", "New users", "Engaged sessions", "Event count", "Total revenue"])
+
+    # Gráfica 1: Total users vs New users
 
-# Gráfica 1: Total users vs New users
-
-if audiences_df is not None and not audiences_df.empty:
-    audiences_melt = audiences_df.melt(id_vars=["Audience name"],
-                                         value_vars=["Total users", "New users"],
-                                         var_name="Tipo", value_name="Usuarios")
-    plt.figure()
-    sns.barplot(x="Audience name", y="Usuarios", hue="Tipo", data=audiences_melt)
-    plt.title("Usuarios Totales vs Nuevos en Audiences")
-    plt.xlabel("Nombre de la Audiencia")
-    plt.ylabel("Cantidad de Usuarios")
-    plt.legend(title="Tipo")
-    plt.show()
-
-# Gráfica 2: Usuarios activos por localidad
-if demographics_df is not None and not demographics_df.empty:
-    plt.figure()
-    sns.barplot(x="Country", y="Active users", data=demographics_df)
-    plt.title("Usuarios Activos por País")
-    plt.xlabel("País")
-    plt.ylabel("Usuarios Activos")
-    plt.show()
-
-# Gráfica 3: Average engagement time per active user
-if engagement_df is not None and not engagement_df.empty and "Nth day" in engagement_df.columns:
-    engagement_df = convert_numeric(engagement_df, ["Nth day", "Average engagement time per active user"])
-    plt.figure()
-    sns.lineplot(x="Nth day", y="Average engagement time per active user", data=engagement_df, marker="o")
-    plt.title("Tendencia de Tiempo Promedio de Engagement")
-    plt.xlabel("Nth day")
-    plt.ylabel("Tiempo de Engagement (segundos)")
-    plt.show()
-
-# Gráfica 4: Distribución de usuarios activos por plataforma
-if tech_overview_df is not None and not tech_overview_df.empty:
-    tech_overview_df = convert_numeric(tech_overview_df, ["Active users"])
-    plt.figure()
-    sns.barplot(x="Platform", y="Active users", data=tech_overview_df)
-    plt.title("Usuarios Activos por Plataforma")
-    plt.xlabel("Plataforma")
-    plt.ylabel("Usuarios Activos")
-    plt.show()
-
-    #5- Crea relaciones de datos
-
-#relación 1: Distribución de Canales de Adquisición de Usuarios
-if user_acquisition_df is not None and not user_acquisition_df.empty:
-    acquisition = user_acquisition_df.groupby("First user primary channel group (Default Channel Group)")["Total users"].sum().reset_index()
-    plt.figure()
-    plt.pie(acquisition["Total users"], labels=acquisition["First user primary channel group (Default Channel Group)"], autopct='%1.1f%%', startangle=140)
-    plt.title("Distribución de Canales de Adquisición de Usuarios")
-    plt.show()
-
-#relación 2: Usuarios Activos por Categoría de Dispositivo
-if tech_overview_df is not None and not tech_overview_df.empty and "Platform / device category" in tech_overview_df.columns:
-    plt.figure()
-    sns.barplot(x="Platform / device category", y="Active users", data=tech_overview_df)
-    plt.title("Usuarios Activos por Categoría de Dispositivo")
-    plt.xlabel("Categoría de Dispositivo")
-    plt.ylabel("Usuarios Activos")
-    plt.show()
-
-#relación 3: Usuarios Activos por Navegador
-if tech_details_df is not None and not tech_details_df.empty:
-    plt.figure()
-    sns.barplot(x="Browser", y="Active users", data=tech_details_df)
-    plt.title("Usuarios Activos por Navegador")
-    plt.xlabel("Navegador")
-    plt.ylabel("Usuarios Activos")
-    plt.show()
-
-#relación 4: Engagement por región
-if demographics_df is not None and not demographics_df.empty:
-    if "Engaged sessions" in demographics_df.columns and "Active users" in demographics_df.columns:
-        demographics_df["Engagement Ratio"] = demographics_df["Engaged sessions"] / demographics_df["Active users"]
+    if audiences_df is not None and not audiences_df.empty:
+        audiences_melt = audiences_df.melt(id_vars=["Audience name"],
+                                             value_vars=["Total users", "New users"],
+                                             var_name="Tipo", value_name="Usuarios")
         plt.figure()
-        sns.barplot(x="Country", y="Engagement Ratio", data=demographics_df)
-        plt.title("Ratio de Engagement por País")
+        sns.barplot(x="Audience name", y="Usuarios", hue="Tipo", data=audiences_melt)
+        plt.title("Usuarios Totales vs Nuevos en Audiences")
+        plt.xlabel("Nombre de la Audiencia")
+        plt.ylabel("Cantidad de Usuarios")
+        plt.legend(title="Tipo")
+        plt.show()
+
+    # Gráfica 2: Usuarios activos por localidad
+    if demographics_df is not None and not demographics_df.empty:
+        plt.figure()
+        sns.barplot(x="Country", y="Active users", data=demographics_df)
+        plt.title("Usuarios Activos por País")
         plt.xlabel("País")
-        plt.ylabel("Ratio de Engagement")
-        plt.show()
\ No newline at end of file
+        plt.ylabel("Usuarios Activos")
+        plt.show()
+
+    # Gráfica 3: Average engagement time per active user
+    if engagement_df is not None and not engagement_df.empty and "Nth day" in engagement_df.columns:
+        engagement_df = convert_numeric(engagement_df, ["Nth day", "Average engagement time per active user"])
+        plt.figure()
+        sns.lineplot(x="Nth day", y="Average engagement time per active user", data=engagement_df, marker="o")
+        plt.title("Tendencia de Tiempo Promedio de Engagement")
+        plt.xlabel("Nth day")
+        plt.ylabel("Tiempo de Engagement (segundos)")
+        plt.show()
+
+    # Gráfica 4: Distribución de usuarios activos por plataforma
+    if tech_overview_df is not None and not tech_overview_df.empty:
+        tech_overview_df = convert_numeric(tech_overview_df, ["Active users"])
+        plt.figure()
+        sns.barplot(x="Platform", y="Active users", data=tech_overview_df)
+        plt.title("Usuarios Activos por Plataforma")
+        plt.xlabel("Plataforma")
+        plt.ylabel("Usuarios Activos")
+        plt.show()
+
+        #5- Crea relaciones de datos
+
+    #relación 1: Distribución de Canales de Adquisición de Usuarios
+    if user_acquisition_df is not None and not user_acquisition_df.empty:
+        acquisition = user_acquisition_df.groupby("First user primary channel group (Default Channel Group)")["Total users"].sum().reset_index()
+        plt.figure()
+        plt.pie(acquisition["Total users"], labels=acquisition["First user primary channel group (Default Channel Group)"], autopct='%1.1f%%', startangle=140)
+        plt.title("Distribución de Canales de Adquisición de Usuarios")
+        plt.show()
+
+    #relación 2: Usuarios Activos por Categoría de Dispositivo
+    if tech_overview_df is not None and not tech_overview_df.empty and "Platform / device category" in tech_overview_df.columns:
+        plt.figure()
+        sns.barplot(x="Platform / device category", y="Active users", data=tech_overview_df)
+        plt.title("Usuarios Activos por Categoría de Dispositivo")
+        plt.xlabel("Categoría de Dispositivo")
+        plt.ylabel("Usuarios Activos")
+        plt.show()
+
+    #relación 3: Usuarios Activos por Navegador
+    if tech_details_df is not None and not tech_details_df.empty:
+        plt.figure()
+        sns.barplot(x="Browser", y="Active users", data=tech_details_df)
+        plt.title("Usuarios Activos por Navegador")
+        plt.xlabel("Navegador")
+        plt.ylabel("Usuarios Activos")
+        plt.show()
+
+    #relación 4: Engagement por región
+    if demographics_df is not None and not demographics_df.empty:
+        if "Engaged sessions" in demographics_df.columns and "Active users" in demographics_df.columns:
+            demographics_df["Engagement Ratio"] = demographics_df["Engaged sessions"] / demographics_df["Active users"]
+            plt.figure()
+            sns.barplot(x="Country", y="Engagement Ratio", data=demographics_df)
+            plt.title("Ratio de Engagement por País")
+            plt.xlabel("País")
+            plt.ylabel("Ratio de Engagement")
+            plt.show()
+
+
+def resumen(conn):
+    """
+    Imprime filas x columnas de cada tabla y los totales del rango más reciente de cada propiedad.
+
+    Solo usa sqlite3 (sin pandas ni matplotlib) para que el arranque sea inmediato.
+
+    Args:
+        conn: Conexión a SQLite
+
+    Returns:
+        Diccionario tabla -> (filas, columnas, {Property: {métrica: total}}); en tablas
+        sin propiedad ni rango de fechas la clave es None y el total es de toda la tabla
+    """
+    resultado = {}
+    for tabla in TABLAS:
+        if not vistas._existe(conn, tabla):
+            print(f"Tabla '{tabla}': no existe")
+            continue
+        columnas = ingesta._columnas_tabla(conn, tabla)
+        filas = conn.execute(f"SELECT COUNT(*) FROM {ingesta._q(tabla)}").fetchone()[0]
+        metricas = [m for m in TOTALES_RESUMEN.get(tabla, []) if m in columnas]
+        totales = {}
+        print(f"Tabla '{tabla}': {filas} filas x {len(columnas)} columnas")
+        if filas and metricas:
+            sumas = ", ".join(f"SUM({ingesta._q(m)})" for m in metricas)
+            if set(ingesta.COLUMNAS_CLAVE) <= set(columnas):
+                # Cada propiedad con su propio rango más reciente: no se suman propiedades entre sí
+                for propiedad, rango in vistas.rangos_recientes(conn, tabla).items():
+                    valores = conn.execute(f"""
+                        SELECT {sumas} FROM {ingesta._q(tabla)}
+                        WHERE "Property" = ? AND "Start date" = ? AND "End date" = ?""",
+                        (propiedad, *rango)).fetchone()
+                    totales[propiedad] = dict(zip(metricas, valores))
+                    etiqueta = f"{propiedad or '(sin propiedad)'} [{rango[0]}-{rango[1]}]"
+                    print(f"  {etiqueta} " + ", ".join(f"{m}={v:g}" for m, v in totales[propiedad].items()
+                                                       if v is not None))
+            else:
+                # Tablas de una base anterior a la ingesta por rangos: sin propiedad ni
+                # fechas, solo se puede totalizar la tabla completa
+                valores = conn.execute(f"SELECT {sumas} FROM {ingesta._q(tabla)}").fetchone()
+                totales[None] = dict(zip(metricas, valores))
+                print("  (toda la tabla) " + ", ".join(f"{m}={v:g}" for m, v in totales[None].items()
+                                                       if v is not None))
+        resultado[tabla] = (filas, len(columnas), totales)
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga los exports de GA y genera las gráficas")
+    parser.add_argument('modo', nargs='?', choices=['graficas', 'resumen', 'aproximado'], default='graficas',
+                        help="'resumen' solo imprime tamaños y totales desde SQLite; "
+                             "'aproximado' imprime distintos, top-K y describe() desde los bosquejos")
+    parser.add_argument('--completo', action='store_true', help="reconstruir todas las tablas")
+    parser.add_argument('--propiedad', help="modo aproximado: solo esta propiedad")
+    parser.add_argument('--desde', help="modo aproximado: Start date mínimo AAAAMMDD")
+    parser.add_argument('--hasta', help="modo aproximado: End date máximo AAAAMMDD")
+    parser.add_argument('--dataset', metavar='RUTA',
+                        help="además escribir y leer el dataset Parquet particionado (carpeta o hdfs://...)")
+    args = parser.parse_args()
+
+    conn = conectar()
+    if args.modo == 'resumen':
+        resumen(conn)
+    elif args.modo == 'aproximado':
+        resumen_aproximado(conn, args.propiedad, args.desde, args.hasta)
+    else:
+        actualizar(conn, forzar=args.completo)
+        if args.dataset:
+            import hadoopIns
+            hadoopIns.ingestar(destino=args.dataset, forzar=args.completo)
+        graficar(cargar_tablas(conn, args.dataset))
+    conn.close()
@@ -1,10 +1,18 @@
+import warnings
+
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from sklearn.impute import SimpleImputer
-from scipy import stats
+
+import instrumentacion
+
+# sklearn y scipy tardan segundos en importarse; solo los cargan las funciones
+# que los usan (el Pipeline vectorizado no los necesita)
+
+# Nombres de estrategia en español aceptados por las funciones de imputación
+ESTRATEGIAS_IMPUTACION = {'media': 'mean', 'mediana': 'median', 'moda': 'most_frequent'}
 
 # Función para cargar datos desde diferentes fuentes
+@instrumentacion.instrumentado()
 def cargar_datos(ruta_archivo, tipo='csv', **kwargs):
     """
     Carga datos desde diferentes tipos de archivos.
@@ -26,7 +34,32 @@ def cargar_datos(ruta_archivo, tipo='csv', **kwargs):
     else:
         raise ValueError(f"Tipo de archivo {tipo} no soportado")
 
+# Función para cargar datos por bloques cuando el archivo no cabe en memoria
+def cargar_datos_por_bloques(ruta_archivo, tipo='csv', tamano_bloque=100_000, **kwargs):
+    """
+    Carga datos por bloques de filas para procesar archivos más grandes que la RAM.
+    
+    Args:
+        ruta_archivo: Ruta del archivo a cargar
+        tipo: Tipo de archivo (csv, json con una línea por registro)
+        tamano_bloque: Número de filas por bloque
+        **kwargs: Argumentos adicionales para la función de carga
+        
+    Returns:
+        Generador de DataFrames
+    """
+    if tipo.lower() == 'csv':
+        with pd.read_csv(ruta_archivo, chunksize=tamano_bloque, **kwargs) as lector:
+            yield from lector
+    elif tipo.lower() == 'json':
+        with pd.read_json(ruta_archivo, lines=True, chunksize=tamano_bloque, **kwargs) as lector:
+            yield from lector
+    else:
+        # Excel no se puede leer por partes
+        raise ValueError(f"Tipo de archivo {tipo} no soportado por bloques")
+
 # Funciones para limpieza de datos
+@instrumentacion.instrumentado()
 def limpiar_datos(df, columnas_a_limpiar=None):
     """
     Limpia un conjunto de datos eliminando o imputando valores nulos.
@@ -49,7 +82,8 @@ def limpiar_datos(df, columnas_a_limpiar=None):
     
     return df_limpio
 
-def imputar_valores(df, estrategia='media', columnas=None):
+@instrumentacion.instrumentado()
+def imputar_valores(df, estrategia='media', columnas=None, conn=None, nombre='imputar'):
     """
     Imputa valores faltantes usando diferentes estrategias.
     
@@ -57,22 +91,31 @@ def imputar_valores(df, estrategia='media', columnas=None):
         df: DataFrame con valores a imputar
         estrategia: Estrategia de imputación ('media', 'mediana', 'moda')
         columnas: Columnas a imputar (None para todas las numéricas)
+        conn: Conexión a SQLite para reutilizar los valores ajustados (ver aplicar_persistente)
+        nombre: Nombre con el que se guarda el estado ajustado
         
     Returns:
         DataFrame con valores imputados
     """
-    df_imputado = df.copy()
-    
     if columnas is None:
         columnas = df.select_dtypes(include=[np.number]).columns
     
-    imputer = SimpleImputer(strategy=estrategia)
+    if conn is not None:
+        pipeline = Pipeline(limpiar=False, estrategia=estrategia, metodo=None, columnas=columnas)
+        return aplicar_persistente(conn, nombre, pipeline, df)[0]
+    
+    from sklearn.impute import SimpleImputer
+
+    df_imputado = df.copy()
+    
+    imputer = SimpleImputer(strategy=ESTRATEGIAS_IMPUTACION.get(estrategia, estrategia))
     df_imputado[columnas] = imputer.fit_transform(df_imputado[columnas])
     
     return df_imputado
 
 # Funciones para transformación de datos
-def normalizar_datos(df, columnas=None, metodo='minmax'):
+@instrumentacion.instrumentado()
+def normalizar_datos(df, columnas=None, metodo='minmax', conn=None, nombre='normalizar'):
     """
     Normaliza los datos numéricos en un rango específico.
     
@@ -80,15 +123,23 @@ def normalizar_datos(df, columnas=None, metodo='minmax'):
         df: DataFrame a normalizar
         columnas: Lista de columnas a normalizar (None para todas las numéricas)
         metodo: Método de normalización ('minmax', 'zscore')
+        conn: Conexión a SQLite para reutilizar la escala ajustada (ver aplicar_persistente)
+        nombre: Nombre con el que se guarda el estado ajustado
         
     Returns:
         DataFrame normalizado
     """
-    df_norm = df.copy()
-    
     if columnas is None:
         columnas = df.select_dtypes(include=[np.number]).columns
     
+    if conn is not None:
+        pipeline = Pipeline(limpiar=False, estrategia=None, metodo=metodo, columnas=columnas)
+        return aplicar_persistente(conn, nombre, pipeline, df)[0]
+    
+    from sklearn.preprocessing import StandardScaler, MinMaxScaler
+
+    df_norm = df.copy()
+    
     if metodo == 'minmax':
         scaler = MinMaxScaler()
         df_norm[columnas] = scaler.fit_transform(df_norm[columnas])
@@ -99,6 +150,7 @@ def normalizar_datos(df, columnas=None, metodo='minmax'):
     return df_norm
 
 # Funciones para agregación y estadísticas
+@instrumentacion.instrumentado()
 def agrupar_datos(df, columnas_agrupacion, columnas_valor, funcion='mean'):
     """
     Agrupa datos por las columnas especificadas y aplica una función a las columnas de valor.
@@ -112,8 +164,9 @@ def agrupar_datos(df, columnas_agrupacion, columnas_valor, funcion='mean'):
     Returns:
         DataFrame agrupado
     """
-    return df.groupby(columnas_agrupacion)[columnas_valor].agg(funcion).reset_index()
+    return df.groupby(columnas_agrupacion, observed=True)[columnas_valor].agg(funcion).reset_index()
 
+@instrumentacion.instrumentado()
 def calcular_estadisticas(df, columnas=None):
     """
     Calcula estadísticas descriptivas para las columnas especificadas.
@@ -131,6 +184,7 @@ def calcular_estadisticas(df, columnas=None):
     return df[columnas].describe()
 
 # Función para detectar outliers
+@instrumentacion.instrumentado()
 def detectar_outliers(df, columna, metodo='iqr'):
     """
     Detecta outliers en una columna específica.
@@ -154,7 +208,1065 @@ def detectar_outliers(df, columna, metodo='iqr'):
         outliers = df[(df[columna] < lower_bound) | (df[columna] > upper_bound)].index
         
     elif metodo == 'zscore':
+        from scipy import stats
         z_scores = np.abs(stats.zscore(df[columna]))
         outliers = df[z_scores > 3].index
         
-    return outliers
\ No newline at end of file
+    return outliers
+
+
+def _por_columna(funcion, X, *args):
+    """
+    Aplica una reducción de NumPy columna por columna.
+
+    np.nanmean, np.nanstd y np.nanpercentile copian el arreglo completo que
+    reciben; por columna, los temporales son del tamaño de una columna.
+    """
+    return np.array([funcion(X[:, j], *args) for j in range(X.shape[1])], dtype=np.float64).T
+
+
+class Pipeline:
+    """
+    Encadena limpieza, imputación, normalización y detección de outliers sobre
+    todas las columnas numéricas en una sola pasada de NumPy.
+
+    A diferencia de llamar limpiar_datos, imputar_valores, normalizar_datos y
+    detectar_outliers por separado, los datos numéricos se copian una sola vez a
+    una matriz que se modifica en su lugar, y los cuantiles/medias de todas las
+    columnas se calculan juntos.
+
+    Args:
+        limpiar: Si se eliminan las filas con todos los valores nulos
+        estrategia: Estrategia de imputación ('media', 'mediana', 'moda' o None)
+        metodo: Método de normalización ('minmax', 'zscore' o None)
+        metodo_outliers: Método para detectar outliers ('iqr', 'zscore')
+        columnas: Columnas a procesar (None para todas las numéricas)
+    """
+
+    def __init__(self, limpiar=True, estrategia='media', metodo='minmax',
+                 metodo_outliers='iqr', columnas=None):
+        self.limpiar = limpiar
+        self.estrategia = ESTRATEGIAS_IMPUTACION.get(estrategia, estrategia)
+        self.metodo = metodo
+        self.metodo_outliers = metodo_outliers
+        self.columnas = columnas
+
+    def _matriz(self, df, columnas=None):
+        """
+        Copia las columnas numéricas a una matriz float (por columnas) y quita las filas vacías.
+
+        Returns:
+            Tupla (df, X, llenas): llenas es la máscara de filas que se conservan,
+            o None si no se quitó ninguna (el DataFrame no se copia)
+        """
+        columnas = columnas if columnas is not None else self.columnas
+        if columnas is None:
+            columnas = df.select_dtypes(include=[np.number]).columns
+        self.columnas_ = list(columnas)
+        # order='F' deja cada columna contigua para devolverla a pandas sin otra copia
+        X = np.array(df[self.columnas_], dtype=np.float64, order='F')
+        llenas = None
+        if self.limpiar and len(X):
+            # Igual que dropna(how='all'), pero revisando la matriz en vez de copiar el DataFrame
+            llenas = ~np.isnan(X).all(axis=1)
+            otras = [c for c in df.columns if c not in set(self.columnas_)]
+            if otras:
+                llenas |= df[otras].notna().any(axis=1).to_numpy()
+            if llenas.all():
+                llenas = None
+            else:
+                compacta = np.empty((int(llenas.sum()), X.shape[1]), order='F')
+                for j in range(X.shape[1]):
+                    compacta[:, j] = X[llenas, j]
+                X = compacta
+        return df, X, llenas
+
+    def _imputar(self, X):
+        """Llena en su lugar los NaN de X con el relleno de su columna."""
+        if self.relleno_ is not None:
+            filas, cols = np.nonzero(np.isnan(X))
+            X[filas, cols] = np.take(self.relleno_, cols)
+
+    def _ajustar_matriz(self, X):
+        """
+        Calcula los parámetros de imputación, normalización y outliers de todas las columnas.
+
+        Para no copiar la matriz, los nulos de X quedan imputados con el relleno ajustado.
+        """
+        if self.metodo_outliers not in ('iqr', 'zscore'):
+            raise ValueError(f"Método de outliers {self.metodo_outliers} no soportado")
+        if not X.size:
+            return self._ajustar_vacio(X.shape[1])
+        # Columnas sin ningún valor: np.nanmean y compañía avisan con RuntimeWarning y dan NaN
+        with np.errstate(all='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            # Estadísticas de referencia de los datos crudos para revisar deriva después
+            self.n_ref_ = (~np.isnan(X)).sum(axis=0).astype(np.float64)
+            self.media_ref_ = _por_columna(np.nanmean, X)
+            self.desviacion_ref_ = _por_columna(np.nanstd, X)
+            if self.estrategia == 'mean':
+                self.relleno_ = self.media_ref_.copy()
+            elif self.estrategia == 'median':
+                self.relleno_ = _por_columna(np.nanmedian, X)
+            elif self.estrategia == 'most_frequent':
+                self.relleno_ = np.array([_moda(X[:, j]) for j in range(X.shape[1])])
+            else:
+                self.relleno_ = None
+            self._imputar(X)
+
+            media = _por_columna(np.nanmean, X)
+            desviacion = _por_columna(np.nanstd, X)
+            if self.metodo_outliers == 'iqr':
+                q1, q3 = _por_columna(np.nanpercentile, X, [25, 75])
+                iqr = q3 - q1
+                self.limite_inf_, self.limite_sup_ = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+            else:
+                # |z| > 3 equivale a salir de media ± 3 desviaciones
+                self.limite_inf_, self.limite_sup_ = media - 3 * desviacion, media + 3 * desviacion
+
+            if self.metodo == 'minmax':
+                minimo = _por_columna(np.nanmin, X)
+                rango = _por_columna(np.nanmax, X) - minimo
+                self.centro_, self.escala_ = minimo, np.where(rango == 0, 1.0, rango)
+            elif self.metodo == 'zscore':
+                self.centro_, self.escala_ = media, np.where(desviacion == 0, 1.0, desviacion)
+            else:
+                self.centro_ = self.escala_ = None
+        return self
+
+    def _ajustar_vacio(self, k):
+        """Parámetros (NaN) para datos sin filas o sin columnas: la transformación da un resultado vacío."""
+        vacio = np.full(k, np.nan)
+        self.n_ref_, self.media_ref_, self.desviacion_ref_ = np.zeros(k), vacio.copy(), vacio.copy()
+        self.relleno_ = vacio.copy() if self.estrategia in ('mean', 'median', 'most_frequent') else None
+        self.limite_inf_, self.limite_sup_ = vacio.copy(), vacio.copy()
+        if self.metodo in ('minmax', 'zscore'):
+            self.centro_, self.escala_ = vacio.copy(), np.ones(k)
+        else:
+            self.centro_ = self.escala_ = None
+        return self
+
+    def _transformar_matriz(self, X):
+        """Aplica imputación, outliers y normalización en su lugar; devuelve la máscara de outliers."""
+        self._imputar(X)
+        # Los outliers se marcan antes de escalar (ambos métodos son invariantes a escala)
+        mascara = (X < self.limite_inf_) | (X > self.limite_sup_)
+        if self.centro_ is not None:
+            X -= self.centro_
+            X /= self.escala_
+        return mascara
+
+    def _armar(self, df, X, llenas, mascara):
+        posicion = {c: j for j, c in enumerate(self.columnas_)}
+        indice = df.index if llenas is None else df.index[llenas]
+        datos = {c: (X[:, posicion[c]] if c in posicion else
+                     (df[c] if llenas is None else df[c].array[llenas])) for c in df.columns}
+        resultado = pd.DataFrame(datos, index=indice, copy=False)
+        return resultado, pd.DataFrame(mascara, index=indice, columns=self.columnas_, copy=False)
+
+    @instrumentacion.instrumentado()
+    def ajustar(self, df):
+        """Calcula los parámetros del pipeline sin transformar los datos."""
+        _, X, _ = self._matriz(df)
+        return self._ajustar_matriz(X)
+
+    @instrumentacion.instrumentado()
+    def transformar(self, df):
+        """
+        Aplica los parámetros ya ajustados a un DataFrame.
+
+        Returns:
+            Tupla (DataFrame transformado, máscara booleana de outliers por columna)
+        """
+        df, X, llenas = self._matriz(df)
+        mascara = self._transformar_matriz(X)
+        return self._armar(df, X, llenas, mascara)
+
+    @instrumentacion.instrumentado()
+    def ejecutar(self, df):
+        """
+        Ajusta y transforma en una sola pasada.
+
+        Args:
+            df: DataFrame a procesar
+
+        Returns:
+            Tupla (DataFrame transformado, máscara booleana de outliers por columna)
+        """
+        df, X, llenas = self._matriz(df)
+        self._ajustar_matriz(X)
+        mascara = self._transformar_matriz(X)
+        return self._armar(df, X, llenas, mascara)
+
+    def _ajustar_estadisticas(self, est):
+        """Calcula los parámetros a partir de estadísticas combinables (ver EstadisticasColumnas)."""
+        self.n_ref_, self.media_ref_, self.desviacion_ref_ = est.n.copy(), est.media.copy(), est.desviacion()
+        if self.estrategia == 'mean':
+            self.relleno_ = est.media.copy()
+        elif self.estrategia == 'median':
+            self.relleno_ = est.cuantiles([50])[0]
+        elif self.estrategia == 'most_frequent':
+            self.relleno_ = est.modas()
+        else:
+            self.relleno_ = None
+        if self.relleno_ is not None:
+            # Las estadísticas siguientes son las de los datos ya imputados
+            est.imputar(self.relleno_)
+
+        media, desviacion = est.media, est.desviacion()
+        if self.metodo_outliers == 'iqr':
+            q1, q3 = est.cuantiles([25, 75])
+            iqr = q3 - q1
+            self.limite_inf_, self.limite_sup_ = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        elif self.metodo_outliers == 'zscore':
+            self.limite_inf_, self.limite_sup_ = media - 3 * desviacion, media + 3 * desviacion
+        else:
+            raise ValueError(f"Método de outliers {self.metodo_outliers} no soportado")
+
+        if self.metodo == 'minmax':
+            rango = est.maximo - est.minimo
+            self.centro_, self.escala_ = est.minimo.copy(), np.where(rango == 0, 1.0, rango)
+        elif self.metodo == 'zscore':
+            self.centro_, self.escala_ = media.copy(), np.where(desviacion == 0, 1.0, desviacion)
+        else:
+            self.centro_ = self.escala_ = None
+        return self
+
+    @instrumentacion.instrumentado()
+    def ajustar_por_bloques(self, bloques):
+        """
+        Primera pasada del modo por bloques: acumula estadísticas combinables.
+
+        Medias y varianzas se combinan exactamente; los cuantiles (mediana e IQR)
+        salen de un t-digest por columna, así que son aproximados.
+
+        Args:
+            bloques: Iterable de DataFrames (p.ej. cargar_datos_por_bloques)
+
+        Returns:
+            El mismo pipeline ya ajustado
+        """
+        est = None
+        for bloque in bloques:
+            if est is None:
+                _, X, _ = self._matriz(bloque)
+                est = EstadisticasColumnas(len(self.columnas_),
+                                           contar_valores=self.estrategia == 'most_frequent')
+            else:
+                _, X, _ = self._matriz(bloque, self.columnas_)
+            est.agregar(X)
+        if est is None:
+            raise ValueError("No hay datos para ajustar")
+        self.estadisticas_ = est
+        return self._ajustar_estadisticas(est)
+
+    def transformar_por_bloques(self, bloques):
+        """
+        Segunda pasada del modo por bloques: aplica los parámetros ajustados.
+
+        Returns:
+            Generador de tuplas (DataFrame transformado, máscara de outliers)
+        """
+        for bloque in bloques:
+            df, X, llenas = self._matriz(bloque, self.columnas_)
+            mascara = self._transformar_matriz(X)
+            yield self._armar(df, X, llenas, mascara)
+
+
+class TDigest:
+    """
+    Resumen aproximado de cuantiles que se puede combinar entre bloques.
+
+    Guarda centroides (media, peso) cuyo tamaño máximo depende de qué tan cerca
+    están de las colas, así que los cuantiles extremos son más precisos.
+
+    Args:
+        compresion: Controla el número de centroides (~compresion / 2)
+    """
+
+    def __init__(self, compresion=200):
+        self.compresion = compresion
+        self.medias = np.empty(0)
+        self.pesos = np.empty(0)
+
+    def _fusionar(self, medias, pesos):
+        orden = np.argsort(medias, kind='mergesort')
+        medias, pesos = medias[orden], pesos[orden]
+        total = pesos.sum()
+        if total == 0:
+            return
+        # Escala k1: cada centroide abarca a lo más una unidad de k
+        q = (np.cumsum(pesos) - pesos / 2) / total
+        k = np.floor(self.compresion / (2 * np.pi) * np.arcsin(2 * q - 1))
+        inicios = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        self.pesos = np.add.reduceat(pesos, inicios)
+        self.medias = np.add.reduceat(medias * pesos, inicios) / self.pesos
+
+    def agregar(self, valores, pesos=None):
+        """Agrega valores (sin NaN) con peso 1 o con los pesos dados."""
+        valores = np.asarray(valores, dtype=np.float64)
+        pesos = np.ones(len(valores)) if pesos is None else np.asarray(pesos, dtype=np.float64)
+        self._fusionar(np.concatenate([self.medias, valores]), np.concatenate([self.pesos, pesos]))
+
+    def unir(self, otro):
+        """Combina otro t-digest con este."""
+        self.agregar(otro.medias, otro.pesos)
+
+    def cuantil(self, q):
+        """Cuantil aproximado (q entre 0 y 1)."""
+        if not len(self.medias):
+            return np.nan
+        acumulado = np.cumsum(self.pesos) - self.pesos / 2
+        return float(np.interp(q * self.pesos.sum(), acumulado, self.medias))
+
+
+class EstadisticasColumnas:
+    """
+    Estadísticas combinables por columna para el modo por bloques: conteos,
+    media y varianza (algoritmo de Chan), mínimo, máximo, un t-digest para
+    cuantiles y, opcionalmente, frecuencias de valores para la moda.
+
+    Args:
+        n_columnas: Número de columnas numéricas
+        compresion: Compresión de los t-digest
+        contar_valores: Si se guardan frecuencias de valores (para imputar con la moda)
+    """
+
+    def __init__(self, n_columnas, compresion=200, contar_valores=False):
+        self.n = np.zeros(n_columnas)
+        self.nulos = np.zeros(n_columnas)
+        self.media = np.zeros(n_columnas)
+        self.m2 = np.zeros(n_columnas)
+        self.minimo = np.full(n_columnas, np.inf)
+        self.maximo = np.full(n_columnas, -np.inf)
+        self.digests = [TDigest(compresion) for _ in range(n_columnas)]
+        self.conteos = [{} for _ in range(n_columnas)] if contar_valores else None
+
+    def _combinar_momentos(self, n, media, m2):
+        total = self.n + n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = media - self.media
+            self.media = np.where(total > 0, self.media + delta * n / total, 0.0)
+            self.m2 = np.where(total > 0, self.m2 + m2 + delta ** 2 * self.n * n / total, 0.0)
+        self.n = total
+
+    def agregar(self, X):
+        """Agrega un bloque (matriz filas x columnas, NaN = faltante)."""
+        validos = ~np.isnan(X)
+        n = validos.sum(axis=0)
+        self.nulos += len(X) - n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            suma = np.where(validos, X, 0.0).sum(axis=0)
+            media = np.where(n > 0, suma / np.maximum(n, 1), 0.0)
+            m2 = np.where(validos, (X - media) ** 2, 0.0).sum(axis=0)
+        self._combinar_momentos(n, media, m2)
+        if len(X):
+            self.minimo = np.fmin(self.minimo, np.nanmin(np.where(validos, X, np.inf), axis=0))
+            self.maximo = np.fmax(self.maximo, np.nanmax(np.where(validos, X, -np.inf), axis=0))
+        for j, digest in enumerate(self.digests):
+            columna = X[validos[:, j], j]
+            digest.agregar(columna)
+            if self.conteos is not None:
+                valores, cuentas = np.unique(columna, return_counts=True)
+                for v, c in zip(valores.tolist(), cuentas.tolist()):
+                    self.conteos[j][v] = self.conteos[j].get(v, 0) + c
+
+    def unir(self, otro):
+        """Combina las estadísticas de otro bloque o proceso."""
+        self.nulos += otro.nulos
+        self._combinar_momentos(otro.n, otro.media, otro.m2)
+        self.minimo = np.fmin(self.minimo, otro.minimo)
+        self.maximo = np.fmax(self.maximo, otro.maximo)
+        for digest, digest_otro in zip(self.digests, otro.digests):
+            digest.unir(digest_otro)
+        if self.conteos is not None and otro.conteos is not None:
+            for conteo, conteo_otro in zip(self.conteos, otro.conteos):
+                for v, c in conteo_otro.items():
+                    conteo[v] = conteo.get(v, 0) + c
+
+    def imputar(self, relleno):
+        """Actualiza las estadísticas como si los nulos se hubieran llenado con `relleno`."""
+        relleno = np.asarray(relleno, dtype=np.float64)
+        llenar = np.where(np.isnan(relleno), 0.0, self.nulos)
+        self._combinar_momentos(llenar, np.nan_to_num(relleno), np.zeros_like(relleno))
+        self.minimo = np.where(llenar > 0, np.fmin(self.minimo, relleno), self.minimo)
+        self.maximo = np.where(llenar > 0, np.fmax(self.maximo, relleno), self.maximo)
+        for j, digest in enumerate(self.digests):
+            if llenar[j]:
+                digest.agregar([relleno[j]], [llenar[j]])
+        self.nulos = self.nulos - llenar
+
+    def desviacion(self):
+        """Desviación estándar poblacional (ddof=0, igual que scipy.stats.zscore)."""
+        return np.sqrt(np.where(self.n > 0, self.m2 / np.maximum(self.n, 1), np.nan))
+
+    def cuantiles(self, percentiles):
+        """Matriz (percentiles x columnas) de cuantiles aproximados."""
+        return np.array([[d.cuantil(p / 100) for d in self.digests] for p in percentiles])
+
+    def modas(self):
+        """Valor más frecuente de cada columna (el menor en caso de empate)."""
+        return np.array([min(c, key=lambda v: (-c[v], v)) if c else np.nan for c in self.conteos])
+
+
+def _hash64(valores):
+    """Hash de 64 bits estable entre corridas (el mismo valor da el mismo hash en strings y category)."""
+    return pd.util.hash_pandas_object(pd.Series(valores), index=False).to_numpy()
+
+
+def _a_bytes(**arreglos):
+    """Serializa arreglos de numpy para guardarlos como BLOB."""
+    import io
+
+    buffer = io.BytesIO()
+    np.savez(buffer, **arreglos)
+    return buffer.getvalue()
+
+
+def _desde_bytes(datos):
+    import io
+
+    with np.load(io.BytesIO(datos)) as arreglos:
+        return {nombre: arreglos[nombre] for nombre in arreglos.files}
+
+
+class HyperLogLog:
+    """
+    Conteo aproximado de valores distintos en memoria constante (2**precision bytes).
+
+    El error relativo típico es 1.04 / sqrt(2**precision) (~1.6% con precision=12)
+    y dos bosquejos se combinan tomando el máximo de cada registro, así que los
+    de varios días dan el conteo de distintos del periodo completo.
+
+    Args:
+        precision: Bits del hash que eligen el registro (4 a 18)
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registros = np.zeros(1 << precision, dtype=np.uint8)
+
+    def agregar(self, valores):
+        """Agrega valores (los nulos se ignoran)."""
+        valores = pd.Series(valores)
+        h = _hash64(valores[valores.notna()])
+        if not len(h):
+            return
+        resto = 64 - self.precision
+        indices = (h >> np.uint64(resto)).astype(np.intp)
+        bits = h & np.uint64((1 << resto) - 1)
+        # Posición del primer 1 en los bits restantes (frexp da la longitud en bits)
+        rho = (resto + 1 - np.frexp(bits.astype(np.float64))[1]).astype(np.uint8)
+        np.maximum.at(self.registros, indices, rho)
+
+    def unir(self, otro):
+        """Combina otro bosquejo con la misma precisión."""
+        np.maximum(self.registros, otro.registros, out=self.registros)
+
+    def estimar(self):
+        """Número aproximado de valores distintos."""
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimado = alfa * m * m / np.sum(np.ldexp(1.0, -self.registros.astype(np.int64)))
+        vacios = np.count_nonzero(self.registros == 0)
+        if estimado <= 2.5 * m and vacios:
+            # Corrección para conteos chicos: conteo lineal sobre los registros vacíos
+            estimado = m * np.log(m / vacios)
+        return float(estimado)
+
+    def error(self):
+        """Error relativo estándar del estimado."""
+        return 1.04 / np.sqrt(len(self.registros))
+
+    def a_bytes(self):
+        return _a_bytes(registros=self.registros)
+
+    @classmethod
+    def desde_bytes(cls, datos):
+        registros = _desde_bytes(datos)['registros']
+        bosquejo = cls(int(np.log2(len(registros))))
+        bosquejo.registros = registros
+        return bosquejo
+
+
+class CountMinTopK:
+    """
+    Sumas aproximadas por clave (count-min) con los candidatos a top-K.
+
+    Cada estimado sobreestima la suma real a lo más e / ancho * total con
+    probabilidad 1 - exp(-profundidad). La memoria es ancho x profundidad más
+    `candidatos` claves, sin importar cuántas claves distintas haya.
+
+    Args:
+        k: Número de claves del top
+        ancho: Columnas de la tabla de conteos
+        profundidad: Filas (funciones hash) de la tabla de conteos
+        candidatos: Claves que se conservan para armar el top (por defecto 4 * k)
+    """
+
+    def __init__(self, k=10, ancho=2048, profundidad=5, candidatos=None):
+        self.k = k
+        self.candidatos = candidatos or 4 * k
+        self.tabla = np.zeros((profundidad, ancho))
+        self.total = 0.0
+        self.claves = np.empty(0, dtype=str)
+
+    def _indices(self, claves):
+        # Doble hashing: la fila i usa h1 + i * h2
+        h = _hash64(claves)
+        h1, h2 = h & np.uint64(0xFFFFFFFF), (h >> np.uint64(32)) | np.uint64(1)
+        filas = np.arange(self.tabla.shape[0], dtype=np.uint64)[:, None]
+        return ((h1 + filas * h2) % np.uint64(self.tabla.shape[1])).astype(np.intp)
+
+    def estimar(self, claves):
+        """Suma aproximada de cada clave (nunca menor a la real)."""
+        claves = np.asarray(claves, dtype=str)
+        if not len(claves):
+            return np.empty(0)
+        indices = self._indices(claves)
+        return self.tabla[np.arange(self.tabla.shape[0])[:, None], indices].min(axis=0)
+
+    def _recortar(self, claves):
+        claves = np.unique(claves)
+        estimados = self.estimar(claves)
+        orden = np.argsort(-estimados, kind='mergesort')[:self.candidatos]
+        self.claves = claves[orden]
+
+    def agregar(self, claves, pesos=None):
+        """Suma `pesos` (1 por defecto) a cada clave; las claves nulas se ignoran."""
+        serie = pd.Series(np.ones(len(claves)) if pesos is None else np.asarray(pesos, dtype=np.float64),
+                          index=pd.Index(np.asarray(claves, dtype=object)))
+        # Se suman primero las repeticiones del bloque: una actualización por clave
+        sumas = serie[serie.index.notna()].fillna(0.0).groupby(level=0).sum()
+        if not len(sumas):
+            return
+        claves = sumas.index.to_numpy(dtype=str)
+        indices = self._indices(claves)
+        for fila in range(self.tabla.shape[0]):
+            np.add.at(self.tabla[fila], indices[fila], sumas.to_numpy())
+        self.total += float(sumas.sum())
+        self._recortar(np.concatenate([self.claves, claves]))
+
+    def unir(self, otro):
+        """Combina otro bosquejo con el mismo ancho y profundidad."""
+        self.tabla += otro.tabla
+        self.total += otro.total
+        self._recortar(np.concatenate([self.claves, otro.claves]))
+
+    def error(self):
+        """Sobreestimación máxima (con probabilidad 1 - exp(-profundidad))."""
+        return np.e / self.tabla.shape[1] * self.total
+
+    def top(self, k=None):
+        """
+        Las k claves con mayor suma estimada.
+
+        Returns:
+            DataFrame con clave, estimado y minimo (estimado menos el error máximo)
+        """
+        estimados = self.estimar(self.claves)
+        orden = np.argsort(-estimados, kind='mergesort')[:k or self.k]
+        return pd.DataFrame({'clave': self.claves[orden], 'estimado': estimados[orden],
+                             'minimo': np.maximum(estimados[orden] - self.error(), 0.0)})
+
+    def a_bytes(self):
+        return _a_bytes(tabla=self.tabla, total=np.array(self.total), claves=self.claves,
+                        k=np.array([self.k, self.candidatos]))
+
+    @classmethod
+    def desde_bytes(cls, datos):
+        arreglos = _desde_bytes(datos)
+        profundidad, ancho = arreglos['tabla'].shape
+        k, candidatos = arreglos['k'].tolist()
+        bosquejo = cls(k, ancho, profundidad, candidatos)
+        bosquejo.tabla = arreglos['tabla']
+        bosquejo.total = float(arreglos['total'])
+        bosquejo.claves = arreglos['claves']
+        return bosquejo
+
+
+class Reservorio:
+    """
+    Muestra uniforme de tamaño fijo de las filas de una tabla, combinable.
+
+    A cada fila se le asigna una prioridad aleatoria y se conservan las
+    `capacidad` de menor prioridad, así que la unión de dos reservorios es una
+    muestra uniforme de la unión. El conteo, mínimo y máximo son exactos.
+
+    Args:
+        columnas: Columnas numéricas a muestrear
+        capacidad: Filas que se conservan
+        semilla: Semilla del generador de prioridades
+    """
+
+    def __init__(self, columnas, capacidad=10_000, semilla=None):
+        self.columnas = list(columnas)
+        self.capacidad = capacidad
+        self.rng = np.random.default_rng(semilla)
+        self.prioridades = np.empty(0)
+        self.valores = np.empty((0, len(self.columnas)))
+        self.n = np.zeros(len(self.columnas))
+        self.minimo = np.full(len(self.columnas), np.inf)
+        self.maximo = np.full(len(self.columnas), -np.inf)
+
+    def _combinar(self, prioridades, valores):
+        prioridades = np.concatenate([self.prioridades, prioridades])
+        valores = np.concatenate([self.valores, valores])
+        if len(prioridades) > self.capacidad:
+            quedan = np.argpartition(prioridades, self.capacidad - 1)[:self.capacidad]
+            prioridades, valores = prioridades[quedan], valores[quedan]
+        self.prioridades, self.valores = prioridades, valores
+
+    def agregar(self, df):
+        """Agrega las filas de un bloque (se usan solo las columnas del reservorio)."""
+        X = df[self.columnas].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        if not len(X):
+            return
+        validos = ~np.isnan(X)
+        self.n += validos.sum(axis=0)
+        self.minimo = np.fmin(self.minimo, np.where(validos, X, np.inf).min(axis=0))
+        self.maximo = np.fmax(self.maximo, np.where(validos, X, -np.inf).max(axis=0))
+        self._combinar(self.rng.random(len(X)), X)
+
+    def unir(self, otro):
+        """Combina otro reservorio con las mismas columnas."""
+        self.n += otro.n
+        self.minimo = np.fmin(self.minimo, otro.minimo)
+        self.maximo = np.fmax(self.maximo, otro.maximo)
+        self._combinar(otro.prioridades, otro.valores)
+
+    def describir(self, confianza=0.95):
+        """
+        Equivalente de describe() calculado sobre la muestra.
+
+        count, min y max son exactos. El error de la media y la desviación es la
+        mitad del intervalo de confianza normal (con corrección por población
+        finita) y el de los cuantiles sale del intervalo de rangos de la muestra;
+        es 0 mientras la muestra contenga todas las filas.
+
+        Args:
+            confianza: Nivel de confianza de los errores
+
+        Returns:
+            Tupla (DataFrame como el de describe(), DataFrame con el error de cada estadística)
+        """
+        from statistics import NormalDist
+
+        z = NormalDist().inv_cdf((1 + confianza) / 2)
+        indice = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+        estimado = pd.DataFrame(np.nan, index=indice, columns=self.columnas)
+        error = pd.DataFrame(0.0, index=indice, columns=self.columnas)
+        for j, col in enumerate(self.columnas):
+            muestra = self.valores[:, j]
+            muestra = np.sort(muestra[~np.isnan(muestra)])
+            m, n = len(muestra), self.n[j]
+            estimado.loc['count', col] = n
+            if not m:
+                error[col] = np.nan
+                continue
+            estimado.loc[['min', 'max'], col] = self.minimo[j], self.maximo[j]
+            media = muestra.mean()
+            desviacion = muestra.std(ddof=1) if m > 1 else np.nan
+            estimado.loc[['mean', 'std'], col] = media, desviacion
+            for q in (0.25, 0.5, 0.75):
+                estimado.loc[f"{q:.0%}", col] = np.quantile(muestra, q)
+            if m >= n:
+                continue
+            finita = np.sqrt(1 - m / n)
+            error.loc['mean', col] = z * desviacion / np.sqrt(m) * finita
+            error.loc['std', col] = z * desviacion / np.sqrt(2 * (m - 1)) * finita if m > 1 else np.nan
+            for q in (0.25, 0.5, 0.75):
+                delta = z * np.sqrt(q * (1 - q) / m) * finita
+                bajo, alto = np.quantile(muestra, [max(q - delta, 0.0), min(q + delta, 1.0)])
+                valor = estimado.loc[f"{q:.0%}", col]
+                error.loc[f"{q:.0%}", col] = max(alto - valor, valor - bajo)
+        return estimado, error
+
+    def a_bytes(self):
+        return _a_bytes(prioridades=self.prioridades, valores=self.valores, n=self.n,
+                        minimo=self.minimo, maximo=self.maximo, columnas=np.array(self.columnas, dtype=str),
+                        capacidad=np.array(self.capacidad))
+
+    @classmethod
+    def desde_bytes(cls, datos):
+        arreglos = _desde_bytes(datos)
+        bosquejo = cls(arreglos['columnas'].tolist(), int(arreglos['capacidad']))
+        for nombre in ('prioridades', 'valores', 'n', 'minimo', 'maximo'):
+            setattr(bosquejo, nombre, arreglos[nombre])
+        return bosquejo
+
+
+@instrumentacion.instrumentado()
+def procesar_por_bloques(ruta_archivo, ruta_destino, pipeline=None, tipo='csv',
+                         tamano_bloque=100_000, **kwargs):
+    """
+    Procesa un archivo más grande que la RAM en dos pasadas por bloques.
+
+    La primera pasada ajusta el pipeline con estadísticas combinables y la
+    segunda imputa, normaliza y marca outliers bloque por bloque, escribiendo
+    el resultado en un CSV. La memoria depende del tamaño del bloque, no del archivo.
+
+    Args:
+        ruta_archivo: Archivo de entrada
+        ruta_destino: CSV de salida (se agrega una columna '<col>_outlier' por columna)
+        pipeline: Pipeline a usar (None para el de valores por defecto)
+        tipo: Tipo de archivo (csv, json)
+        tamano_bloque: Número de filas por bloque
+        **kwargs: Argumentos adicionales para la función de carga
+
+    Returns:
+        Serie con el número de outliers por columna
+    """
+    pipeline = pipeline or Pipeline()
+    pipeline.ajustar_por_bloques(cargar_datos_por_bloques(ruta_archivo, tipo, tamano_bloque, **kwargs))
+    total = pd.Series(0, index=pipeline.columnas_)
+    primero = True
+    for df, mascara in pipeline.transformar_por_bloques(
+            cargar_datos_por_bloques(ruta_archivo, tipo, tamano_bloque, **kwargs)):
+        total += mascara.sum()
+        salida = df.join(mascara.add_suffix('_outlier'))
+        salida.to_csv(ruta_destino, mode='w' if primero else 'a', header=primero, index=False)
+        primero = False
+    return total
+
+
+# Parámetros del Pipeline que se guardan por columna en la tabla _transformadores
+PARAMETROS_ESTADO = ['relleno_', 'centro_', 'escala_', 'limite_inf_', 'limite_sup_',
+                     'n_ref_', 'media_ref_', 'desviacion_ref_']
+
+def guardar_estado(conn, nombre, pipeline):
+    """
+    Guarda los parámetros ajustados de un Pipeline en SQLite.
+    
+    Args:
+        conn: Conexión a SQLite (p.ej. traffic_analysis.db)
+        nombre: Nombre del estado (uno por tipo de lote)
+        pipeline: Pipeline ya ajustado
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _transformadores (
+            nombre TEXT, columna TEXT, posicion INTEGER,
+            estrategia TEXT, metodo TEXT, metodo_outliers TEXT, limpiar INTEGER,
+            relleno REAL, centro REAL, escala REAL, limite_inf REAL, limite_sup REAL,
+            n_ref REAL, media_ref REAL, desviacion_ref REAL, ajustado TEXT,
+            PRIMARY KEY (nombre, columna)
+        )""")
+    k = len(pipeline.columnas_)
+    valores = [np.full(k, np.nan) if getattr(pipeline, p) is None else np.asarray(getattr(pipeline, p), dtype=np.float64)
+               for p in PARAMETROS_ESTADO]
+    ajustado = pd.Timestamp.now().isoformat(timespec='seconds')
+    filas = [(nombre, col, j, pipeline.estrategia, pipeline.metodo, pipeline.metodo_outliers, int(pipeline.limpiar),
+              *[None if np.isnan(v[j]) else float(v[j]) for v in valores], ajustado)
+             for j, col in enumerate(pipeline.columnas_)]
+    with conn:
+        conn.execute("DELETE FROM _transformadores WHERE nombre = ?", (nombre,))
+        conn.executemany(f"INSERT INTO _transformadores VALUES ({', '.join('?' * 16)})", filas)
+
+def cargar_estado(conn, nombre):
+    """
+    Reconstruye un Pipeline ajustado desde SQLite.
+    
+    Returns:
+        Pipeline listo para transformar, o None si no hay estado guardado
+    """
+    existe = conn.execute("SELECT 1 FROM sqlite_master WHERE name = '_transformadores'").fetchone()
+    if not existe:
+        return None
+    filas = conn.execute("""
+        SELECT columna, estrategia, metodo, metodo_outliers, limpiar, relleno, centro, escala,
+               limite_inf, limite_sup, n_ref, media_ref, desviacion_ref
+        FROM _transformadores WHERE nombre = ? ORDER BY posicion""", (nombre,)).fetchall()
+    if not filas:
+        return None
+    _, estrategia, metodo, metodo_outliers, limpiar = filas[0][:5]
+    pipeline = Pipeline(limpiar=bool(limpiar), estrategia=estrategia, metodo=metodo,
+                        metodo_outliers=metodo_outliers, columnas=[f[0] for f in filas])
+    pipeline.columnas_ = pipeline.columnas
+    matriz = np.array([f[5:] for f in filas], dtype=np.float64).T
+    for parametro, valores in zip(PARAMETROS_ESTADO, matriz):
+        setattr(pipeline, parametro, valores)
+    if estrategia is None:
+        pipeline.relleno_ = None
+    if metodo is None:
+        pipeline.centro_ = pipeline.escala_ = None
+    return pipeline
+
+def hay_deriva(pipeline, df, umbral=0.5):
+    """
+    Revisa si un lote se alejó de las estadísticas con las que se ajustó el pipeline.
+    
+    Hay deriva si falta alguna columna, si la media de alguna columna se movió
+    más de `umbral` desviaciones de referencia, o si su desviación se duplicó o
+    se redujo a la mitad.
+    
+    Returns:
+        True si conviene volver a ajustar
+    """
+    if any(c not in df.columns for c in pipeline.columnas_):
+        return True
+    X = np.asarray(df[pipeline.columnas_], dtype=np.float64)
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        media = np.nanmean(X, axis=0)
+        desviacion = np.nanstd(X, axis=0)
+        referencia = np.where(pipeline.desviacion_ref_ > 0, pipeline.desviacion_ref_, 1.0)
+        cambio_media = np.abs(media - pipeline.media_ref_) / referencia
+        razon = (desviacion + 1e-12) / (pipeline.desviacion_ref_ + 1e-12)
+    return bool(np.any(cambio_media > umbral) or np.any((razon > 2) | (razon < 0.5)))
+
+@instrumentacion.instrumentado()
+def aplicar_persistente(conn, nombre, pipeline, df, umbral=0.5):
+    """
+    Ajusta una vez y aplica muchas: transforma un lote con el estado guardado.
+    
+    Si no hay estado guardado con ese nombre, si su configuración es otra, o si
+    hay_deriva detecta que el lote cambió, se ajusta `pipeline` con este lote y se guarda; si no, solo se
+    aplica la transformación vectorizada con los parámetros guardados, así que
+    todos los lotes diarios quedan en la misma escala.
+    
+    Args:
+        conn: Conexión a SQLite
+        nombre: Nombre del estado guardado
+        pipeline: Pipeline (sin ajustar) con la configuración a usar si hay que ajustar
+        df: Lote a transformar
+        umbral: Umbral de deriva (en desviaciones estándar)
+        
+    Returns:
+        Tupla (DataFrame transformado, máscara de outliers, si se volvió a ajustar)
+    """
+    guardado = cargar_estado(conn, nombre)
+    mismo = guardado is not None and all(
+        getattr(guardado, p) == getattr(pipeline, p) for p in ('estrategia', 'metodo', 'metodo_outliers', 'limpiar')
+    ) and (pipeline.columnas is None or list(pipeline.columnas) == guardado.columnas_)
+    if mismo and not hay_deriva(guardado, df, umbral):
+        return (*guardado.transformar(df), False)
+    resultado, mascara = pipeline.ejecutar(df)
+    guardar_estado(conn, nombre, pipeline)
+    return resultado, mascara, True
+
+
+# Funciones del modo aproximado: memoria constante sin importar el tamaño de la tabla
+def _bloques(datos):
+    """Un DataFrame o un iterable de bloques (p.ej. cargar_datos_por_bloques) como bloques."""
+    return [datos] if isinstance(datos, pd.DataFrame) else datos
+
+@instrumentacion.instrumentado()
+def contar_distintos(datos, columna, por=None, precision=12):
+    """
+    Cuenta aproximada de valores distintos (p.ej. usuarios) con HyperLogLog.
+    
+    Args:
+        datos: DataFrame o iterable de bloques
+        columna: Columna cuyos valores distintos se cuentan (p.ej. un ID de usuario)
+        por: Dimensión de baja cardinalidad para contar por cada valor (None para el total)
+        precision: Precisión de los HyperLogLog
+        
+    Returns:
+        DataFrame con el estimado y su error estándar (una fila por valor de `por`)
+    """
+    bosquejos = {}
+    for bloque in _bloques(datos):
+        grupos = [(None, bloque)] if por is None else bloque.groupby(por, observed=True)
+        for valor, grupo in grupos:
+            bosquejos.setdefault(valor, HyperLogLog(precision)).agregar(grupo[columna])
+    resultado = pd.DataFrame({'distintos': {v: b.estimar() for v, b in bosquejos.items()}})
+    resultado['error'] = resultado['distintos'] * HyperLogLog(precision).error()
+    return resultado.rename_axis(por).reset_index() if por is not None else resultado.reset_index(drop=True)
+
+@instrumentacion.instrumentado()
+def top_k(datos, dimension, metrica=None, k=10, ancho=2048, profundidad=5):
+    """
+    Las k claves de `dimension` con mayor suma de `metrica` usando count-min.
+    
+    Args:
+        datos: DataFrame o iterable de bloques
+        dimension: Columna clave (p.ej. "Page path and screen class")
+        metrica: Columna a sumar (None para contar filas)
+        k: Número de claves
+        ancho: Ancho de la tabla count-min (error máximo e / ancho * total)
+        profundidad: Funciones hash de la tabla count-min
+        
+    Returns:
+        DataFrame con clave, estimado y mínimo garantizado (con probabilidad 1 - exp(-profundidad))
+    """
+    bosquejo = CountMinTopK(k, ancho, profundidad)
+    for bloque in _bloques(datos):
+        bosquejo.agregar(bloque[dimension], None if metrica is None else bloque[metrica])
+    return bosquejo.top().rename(columns={'clave': dimension})
+
+@instrumentacion.instrumentado()
+def describir_muestra(datos, columnas=None, capacidad=10_000, confianza=0.95, semilla=None):
+    """
+    describe() aproximado sobre una muestra de reservorio, con cotas de error.
+    
+    Args:
+        datos: DataFrame o iterable de bloques
+        columnas: Columnas a describir (None para las numéricas del primer bloque)
+        capacidad: Tamaño de la muestra
+        confianza: Nivel de confianza de las cotas
+        semilla: Semilla del muestreo
+        
+    Returns:
+        Tupla (estadísticas como describe(), error de cada estadística)
+    """
+    reservorio = None
+    for bloque in _bloques(datos):
+        if reservorio is None:
+            columnas = list(bloque.select_dtypes(include=[np.number]).columns) if columnas is None else columnas
+            reservorio = Reservorio(columnas, capacidad, semilla)
+        reservorio.agregar(bloque)
+    return (reservorio or Reservorio(columnas or [], capacidad)).describir(confianza)
+
+
+# Bosquejos que actualizar_bosquejos guarda en SQLite, uno por propiedad y rango de fechas:
+# tabla -> (dimensión del top y de los distintos, métrica que se suma en el top)
+BOSQUEJOS = {
+    'pages': ("Page path and screen class", "Views"),
+}
+TIPOS_BOSQUEJO = {'distintos': HyperLogLog, 'top': CountMinTopK, 'muestra': Reservorio}
+
+def preparar_bosquejos(conn):
+    """Crea la tabla de bosquejos y su registro de versiones aplicadas."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _bosquejos (
+            tabla      TEXT,
+            Property   TEXT,
+            start_date TEXT,
+            end_date   TEXT,
+            tipo       TEXT,
+            datos      BLOB,
+            PRIMARY KEY (tabla, Property, start_date, end_date, tipo)
+        )""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _bosquejos_version (
+            tabla   TEXT PRIMARY KEY,
+            version INTEGER
+        )""")
+
+@instrumentacion.instrumentado()
+def actualizar_bosquejos(conn, tamano_bloque=100_000, k=10, capacidad=10_000):
+    """
+    Calcula los bosquejos de las tablas de BOSQUEJOS por propiedad y rango de fechas.
+    
+    Por rango se guardan un HyperLogLog de la dimensión, un count-min con el
+    top-K de la métrica y un reservorio de las columnas numéricas. Solo se
+    recalculan los rangos que cambiaron (según _cambios) y la tabla se lee por
+    bloques, así que la memoria no depende del tamaño de la tabla.
+    
+    Args:
+        conn: Conexión a SQLite
+        tamano_bloque: Filas por bloque de lectura
+        k: Claves del top
+        capacidad: Filas de cada reservorio
+        
+    Returns:
+        Diccionario tabla -> número de rangos recalculados
+    """
+    import ingesta
+    from ingesta import _q
+
+    ingesta.preparar_metadatos(conn)
+    preparar_bosquejos(conn)
+    procesadas = {}
+    for tabla, (dimension, metrica) in BOSQUEJOS.items():
+        columnas = ingesta._columnas_tabla(conn, tabla)
+        # Las tablas de una base anterior a la ingesta por rangos no tienen
+        # Property/Start date/End date (como en main.resumen, se saltan)
+        if dimension not in columnas or not set(ingesta.COLUMNAS_CLAVE) <= set(columnas):
+            continue
+        actual = ingesta.version_tabla(conn, tabla)
+        fila = conn.execute("SELECT version FROM _bosquejos_version WHERE tabla = ?", (tabla,)).fetchone()
+        aplicada = fila[0] if fila else None
+        if aplicada == actual:
+            continue
+        rangos = None
+        if aplicada is not None:
+            rangos = conn.execute("""
+                SELECT DISTINCT start_date, end_date FROM _cambios
+                WHERE tabla = ? AND version > ?""", (tabla, aplicada)).fetchall()
+            if any(inicio is None for inicio, _ in rangos):
+                rangos = None
+        if rangos is None:
+            conn.execute("DELETE FROM _bosquejos WHERE tabla = ?", (tabla,))
+            rangos = conn.execute(f'SELECT DISTINCT "Start date", "End date" FROM {_q(tabla)}').fetchall()
+        numericas = [c for c in columnas if c not in ingesta.COLUMNAS_CLAVE + [dimension]]
+        with conn:
+            for inicio, fin in rangos:
+                bosquejos = {}
+                for bloque in pd.read_sql_query(
+                        f'SELECT * FROM {_q(tabla)} WHERE "Start date" = ? AND "End date" = ?',
+                        conn, params=(inicio, fin), chunksize=tamano_bloque):
+                    for propiedad, grupo in bloque.groupby("Property", dropna=False):
+                        if propiedad not in bosquejos:
+                            bosquejos[propiedad] = {'distintos': HyperLogLog(), 'top': CountMinTopK(k),
+                                                    'muestra': Reservorio(numericas, capacidad)}
+                        b = bosquejos[propiedad]
+                        b['distintos'].agregar(grupo[dimension])
+                        b['top'].agregar(grupo[dimension], grupo[metrica] if metrica in grupo else None)
+                        b['muestra'].agregar(grupo)
+                conn.execute("DELETE FROM _bosquejos WHERE tabla = ? AND start_date = ? AND end_date = ?",
+                             (tabla, inicio, fin))
+                conn.executemany("INSERT INTO _bosquejos VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(tabla, propiedad, inicio, fin, tipo, bosquejo.a_bytes())
+                                  for propiedad, b in bosquejos.items() for tipo, bosquejo in b.items()])
+            conn.execute("INSERT OR REPLACE INTO _bosquejos_version (tabla, version) VALUES (?, ?)",
+                         (tabla, actual))
+        procesadas[tabla] = len(rangos)
+    return procesadas
+
+def cargar_bosquejo(conn, tabla, tipo, propiedad=None, desde=None, hasta=None):
+    """
+    Une los bosquejos guardados de los rangos dentro de [desde, hasta].
+    
+    Los rangos que se traslapan se suman dos veces en el top y la muestra; para
+    un periodo sin traslapes conviene pedir rangos consecutivos.
+    
+    Args:
+        conn: Conexión a SQLite
+        tabla: Tabla de BOSQUEJOS (p.ej. 'pages')
+        tipo: 'distintos', 'top' o 'muestra'
+        propiedad: Propiedad de GA (None para todas)
+        desde: "Start date" mínimo AAAAMMDD (None sin límite)
+        hasta: "End date" máximo AAAAMMDD (None sin límite)
+        
+    Returns:
+        El bosquejo combinado, o None si no hay ninguno guardado
+    """
+    preparar_bosquejos(conn)
+    condiciones, params = ["tabla = ?", "tipo = ?"], [tabla, tipo]
+    for condicion, valor in (("Property = ?", propiedad), ("start_date >= ?", desde), ("end_date <= ?", hasta)):
+        if valor is not None:
+            condiciones.append(condicion)
+            params.append(valor)
+    combinado = None
+    for (datos,) in conn.execute(f"SELECT datos FROM _bosquejos WHERE {' AND '.join(condiciones)}", params):
+        bosquejo = TIPOS_BOSQUEJO[tipo].desde_bytes(datos)
+        if combinado is None:
+            combinado = bosquejo
+        else:
+            combinado.unir(bosquejo)
+    return combinado
+
+@instrumentacion.instrumentado()
+def resumen_aproximado(conn, tabla='pages', propiedad=None, desde=None, hasta=None, k=10, confianza=0.95):
+    """
+    Distintos, top-K y describe() de una tabla a partir de sus bosquejos guardados.
+    
+    Returns:
+        Diccionario con 'distintos' (estimado, error), 'top' (DataFrame) y
+        'describe' (estadísticas, error), o None si la tabla no tiene bosquejos
+    """
+    distintos, top, muestra = (cargar_bosquejo(conn, tabla, tipo, propiedad, desde, hasta)
+                               for tipo in ('distintos', 'top', 'muestra'))
+    if distintos is None:
+        return None
+    estimado = distintos.estimar()
+    return {'distintos': (estimado, estimado * distintos.error()),
+            'top': top.top(k).rename(columns={'clave': BOSQUEJOS[tabla][0]}),
+            'describe': muestra.describir(confianza)}
+
+
+def _moda(columna):
+    """Valor más frecuente de un arreglo ignorando NaN (el menor en caso de empate)."""
+    valores, cuentas = np.unique(columna[~np.isnan(columna)], return_counts=True)
+    return valores[np.argmax(cuentas)] if len(valores) else np.nan
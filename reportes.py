@@ -0,0 +1,150 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')  # sin pantalla: nunca se abre una ventana
+
+from matplotlib.backends.backend_pdf import PdfPages
+
+import staging
+
+SALIDA = 'reportes'
+FORMATOS = ('png', 'svg', 'pdf')
+# Archivo dentro de la carpeta de salida con la huella de datos de cada figura, por
+# formato: {formato: {'huellas': {plantilla: huella}, 'vacias': [plantillas sin datos]}}
+MANIFIESTO = '.huellas.json'
+
+
+def _plantilla(nombre):
+    if staging.dfs is None:  # procesos creados con spawn no heredan los datos cargados
+        staging.cargar()
+    return next(fn for fn in staging.templates if fn.__name__ == nombre)
+
+
+def _archivo(nombre):
+    """Nombre de archivo seguro para una plantilla (las de páginas llevan '/').
+
+    El sufijo con el hash del nombre original evita que dos rutas distintas
+    (p. ej. '/a.b' y '/a_b') terminen en el mismo archivo.
+    """
+    seguro = "".join(c if c.isalnum() or c in '-_' else '_' for c in nombre)
+    return f"{seguro}-{hashlib.sha1(nombre.encode()).hexdigest()[:8]}"
+
+
+def huella_plantilla(fn):
+    df = staging.ENTRADAS.get(fn)
+    return staging.huella_df(df) if df is not None else ''
+
+
+def _leer_manifiesto(ruta):
+    """Manifiesto de la carpeta de salida (solo las entradas por formato; los de antes se descartan)."""
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta) as f:
+        manifiesto = json.load(f)
+    return {formato: manifiesto[formato] for formato in FORMATOS if isinstance(manifiesto.get(formato), dict)}
+
+
+def _render_archivo(nombre, ruta, formato):
+    """Trabajo de un proceso del pool: renderiza una plantilla a un archivo."""
+    inicio = time.perf_counter()
+    fig = staging.render_figure(_plantilla(nombre))
+    if fig is None:
+        return nombre, None, time.perf_counter() - inicio
+    fig.savefig(ruta, format=formato, bbox_inches='tight')
+    staging.soltar_figura(_plantilla(nombre))
+    return nombre, ruta, time.perf_counter() - inicio
+
+
+def _render_pickle(nombre):
+    """Trabajo de un proceso del pool: renderiza una plantilla y devuelve la figura serializada."""
+    inicio = time.perf_counter()
+    fig = staging.render_figure(_plantilla(nombre))
+    return nombre, pickle.dumps(fig) if fig is not None else None, time.perf_counter() - inicio
+
+
+def generar_reportes(salida=SALIDA, formato='png', procesos=None, forzar=False):
+    """
+    Renderiza todas las plantillas de staging.templates sin pantalla.
+
+    Cada figura se renderiza en un pool de procesos con el backend Agg. Las
+    figuras cuya huella de datos no cambió desde la última corrida no se
+    vuelven a generar. En formato 'pdf' se escribe un solo PDF de varias páginas,
+    que solo se regenera si cambió alguna figura.
+
+    Args:
+        salida: Carpeta de salida
+        formato: 'png', 'svg' o 'pdf'
+        procesos: Número de procesos (None = núcleos disponibles)
+        forzar: Si es True se renderiza todo aunque no haya cambios
+
+    Returns:
+        Diccionario plantilla -> segundos de render (0 si se saltó)
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato {formato} no soportado")
+    if staging.dfs is None:
+        staging.cargar()
+    os.makedirs(salida, exist_ok=True)
+    ruta_manifiesto = os.path.join(salida, MANIFIESTO)
+    manifiesto = _leer_manifiesto(ruta_manifiesto)
+    # Cada formato tiene sus propias huellas: cambiar de png a pdf no invalida las del otro
+    previas = manifiesto.get(formato, {}).get('huellas', {})
+    vacias = set(manifiesto.get(formato, {}).get('vacias', []))
+    huellas = {fn.__name__: huella_plantilla(fn) for fn in staging.templates}
+    tiempos = {}
+
+    if formato == 'pdf':
+        ruta_pdf = os.path.join(salida, 'reporte.pdf')
+        cambiadas = [n for n, h in huellas.items() if previas.get(n) != h]
+        if not cambiadas and os.path.exists(ruta_pdf) and not forzar:
+            return {n: 0 for n in huellas}
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = {n: (datos, seg) for n, datos, seg in pool.map(_render_pickle, huellas)}
+        with PdfPages(ruta_pdf) as pdf:
+            for nombre in huellas:
+                datos, tiempos[nombre] = resultados[nombre]
+                if datos is not None:
+                    pdf.savefig(pickle.loads(datos), bbox_inches='tight')
+    else:
+        trabajos = []
+        for nombre, huella in huellas.items():
+            ruta = os.path.join(salida, f"{_archivo(nombre)}.{formato}")
+            # Las plantillas sin datos no dejan archivo: se recuerdan en 'vacias'
+            if not forzar and previas.get(nombre) == huella and (nombre in vacias or os.path.exists(ruta)):
+                tiempos[nombre] = 0
+                continue
+            trabajos.append((nombre, ruta, formato))
+        if trabajos:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                for nombre, ruta, seg in pool.map(_render_archivo, *zip(*trabajos)):
+                    tiempos[nombre] = seg
+                    if ruta is None:
+                        vacias.add(nombre)
+                    else:
+                        vacias.discard(nombre)
+
+    manifiesto[formato] = {'huellas': {**previas, **huellas}, 'vacias': sorted(vacias)}
+    with open(ruta_manifiesto, 'w') as f:
+        json.dump(manifiesto, f, indent=1)
+    return tiempos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera las gráficas del dashboard sin pantalla")
+    parser.add_argument('--salida', default=SALIDA, help="carpeta de salida")
+    parser.add_argument('--formato', choices=FORMATOS, default='png')
+    parser.add_argument('--procesos', type=int, default=None)
+    parser.add_argument('--forzar', action='store_true', help="renderizar aunque los datos no cambiaron")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    tiempos = generar_reportes(args.salida, args.formato, args.procesos, args.forzar)
+    for nombre, seg in tiempos.items():
+        print(f"{nombre}: {seg * 1000:.0f} ms" if seg else f"{nombre}: sin cambios")
+    print(f"Total: {time.perf_counter() - inicio:.2f} s")
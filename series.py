@@ -0,0 +1,189 @@
+import argparse
+import sqlite3
+
+import ingesta
+import instrumentacion
+from ingesta import _q
+
+# Fecha absoluta de una fila: "Start date" (AAAAMMDD) más "Nth day" días
+FECHA_SQL = ("date(substr(\"Start date\", 1, 4) || '-' || substr(\"Start date\", 5, 2) || '-' || "
+             "substr(\"Start date\", 7, 2), '+' || CAST(\"Nth day\" AS INTEGER) || ' days')")
+
+# Agrupaciones de consultar(): periodo -> expresión SQL sobre la fecha
+PERIODOS = {
+    'dia': "fecha",
+    'semana': "date(fecha, 'weekday 0', '-6 days')",  # lunes de la semana
+    'mes': "strftime('%Y-%m-01', fecha)",
+}
+
+
+def preparar_series(conn):
+    """Crea la tabla de series diarias y su registro de versiones aplicadas."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS series_diarias (
+            Property   TEXT,
+            metrica    TEXT,
+            fecha      TEXT,
+            valor      REAL,
+            fin_export TEXT,
+            PRIMARY KEY (Property, metrica, fecha)
+        ) WITHOUT ROWID""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _series (
+            tabla   TEXT PRIMARY KEY,
+            version INTEGER
+        )""")
+
+
+def tablas_diarias(conn):
+    """Tablas con columna "Nth day" (secciones diarias de engagement y reports)."""
+    tablas = [n for (n,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    # Las de una base anterior a la ingesta por rangos no tienen Start date: no hay fecha absoluta
+    return [t for t in tablas if not t.startswith(('_', 'mv_')) and t != 'series_diarias'
+            and {"Nth day", *ingesta.COLUMNAS_CLAVE} <= set(ingesta._columnas_tabla(conn, t))]
+
+
+def _fecha(aaaammdd):
+    return f"{aaaammdd[:4]}-{aaaammdd[4:6]}-{aaaammdd[6:8]}"
+
+
+def _recalcular(conn, tablas, metrica, rango=None):
+    """
+    Vuelve a calcular una métrica de series_diarias, completa o solo en los días de un rango.
+
+    Primero se borran sus filas (así desaparecen los días que un export ya no
+    trae) y luego se insertan desde todas las tablas diarias que tienen la
+    métrica, no solo la que cambió: una métrica puede venir de varias tablas.
+
+    Args:
+        conn: Conexión a SQLite
+        tablas: Tablas diarias con sus columnas (tabla -> columnas)
+        metrica: Métrica a recalcular
+        rango: (Start date, End date) AAAAMMDD; None para toda la serie
+    """
+    if rango is None:
+        conn.execute("DELETE FROM series_diarias WHERE metrica = ?", (metrica,))
+        filtro, params = "WHERE true", ()
+    else:
+        inicio, fin = rango
+        conn.execute("DELETE FROM series_diarias WHERE metrica = ? AND fecha BETWEEN ? AND ?",
+                     (metrica, _fecha(inicio), _fecha(fin)))
+        # Solo los exports que se traslapan con el rango, y de ellos los días dentro del rango
+        filtro = f'WHERE "Start date" <= ? AND "End date" >= ? AND {FECHA_SQL} BETWEEN ? AND ?'
+        params = (fin, inicio, _fecha(inicio), _fecha(fin))
+    for tabla, columnas in tablas.items():
+        if metrica not in columnas:
+            continue
+        conn.execute(f"""
+            INSERT INTO series_diarias (Property, metrica, fecha, valor, fin_export)
+            SELECT "Property", ?, {FECHA_SQL}, {_q(metrica)}, "End date"
+            FROM {_q(tabla)} {filtro}
+            ON CONFLICT (Property, metrica, fecha) DO UPDATE
+                SET valor = excluded.valor, fin_export = excluded.fin_export
+                WHERE excluded.fin_export >= series_diarias.fin_export
+        """, (metrica, *params))
+
+
+@instrumentacion.instrumentado()
+def actualizar_series(conn):
+    """
+    Pasa las secciones "Nth day" a series con fecha absoluta.
+
+    Solo se leen los rangos que cambiaron desde la última actualización (según
+    _cambios). Si dos exports con rangos traslapados traen el mismo día, gana
+    el del export que termina más tarde.
+
+    Args:
+        conn: Conexión a SQLite
+
+    Returns:
+        Diccionario tabla -> número de rangos procesados (None si se procesó completa)
+    """
+    ingesta.preparar_metadatos(conn)
+    preparar_series(conn)
+    procesadas = {}
+    tablas = {t: ingesta._columnas_tabla(conn, t) for t in tablas_diarias(conn)}
+    for tabla in tablas:
+        actual = ingesta.version_tabla(conn, tabla)
+        fila = conn.execute("SELECT version FROM _series WHERE tabla = ?", (tabla,)).fetchone()
+        aplicada = fila[0] if fila else None
+        if aplicada == actual:
+            continue
+        rangos = [None]
+        if aplicada is not None:
+            rangos = conn.execute("""
+                SELECT DISTINCT start_date, end_date FROM _cambios
+                WHERE tabla = ? AND version > ?""", (tabla, aplicada)).fetchall()
+            if any(not inicio or not fin for inicio, fin in rangos):
+                rangos = [None]
+        metricas = [c for c in tablas[tabla] if c not in ["Nth day"] + ingesta.COLUMNAS_CLAVE]
+        with conn:
+            for rango in rangos:
+                for metrica in metricas:
+                    _recalcular(conn, tablas, metrica, rango)
+            conn.execute("INSERT OR REPLACE INTO _series (tabla, version) VALUES (?, ?)", (tabla, actual))
+        procesadas[tabla] = None if rangos == [None] else len(rangos)
+    if procesadas:
+        with conn:
+            ingesta.marcar_version(conn, 'series_diarias')
+    return procesadas
+
+
+@instrumentacion.instrumentado()
+def consultar(conn, metrica, desde=None, hasta=None, propiedad=None, periodo='dia', movil=None):
+    """
+    Consulta una métrica diaria por rango de fechas, con rollup o promedio móvil en SQL.
+
+    Args:
+        conn: Conexión a SQLite
+        metrica: Nombre de la métrica (columna original, p.ej. "Active users")
+        desde: Fecha inicial 'AAAA-MM-DD' (incluida; None sin límite)
+        hasta: Fecha final 'AAAA-MM-DD' (incluida; None sin límite)
+        propiedad: Propiedad de GA (None para todas)
+        periodo: 'dia', 'semana' (inicia en lunes) o 'mes'; fuera de 'dia' se promedian los días
+        movil: N para agregar la columna 'promedio_movil' de los últimos N periodos
+
+    Returns:
+        DataFrame con Property, fecha (inicio del periodo), valor y, opcionalmente, promedio_movil
+    """
+    import pandas as pd
+
+    if periodo not in PERIODOS:
+        raise ValueError(f"Periodo {periodo} no soportado")
+    condiciones, params = ["metrica = ?"], [metrica]
+    for condicion, valor in (("fecha >= ?", desde), ("fecha <= ?", hasta), ("Property = ?", propiedad)):
+        if valor is not None:
+            condiciones.append(condicion)
+            params.append(valor)
+    sql = f"""
+        SELECT Property, {PERIODOS[periodo]} AS fecha, AVG(valor) AS valor
+        FROM series_diarias WHERE {' AND '.join(condiciones)}
+        GROUP BY Property, {PERIODOS[periodo]}"""
+    if movil:
+        sql = f"""
+            SELECT *, AVG(valor) OVER (PARTITION BY Property ORDER BY fecha
+                                       ROWS BETWEEN {int(movil) - 1} PRECEDING AND CURRENT ROW) AS promedio_movil
+            FROM ({sql})"""
+    return pd.read_sql_query(sql + " ORDER BY Property, fecha", conn, params=params)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas sobre las series diarias de GA")
+    parser.add_argument('metrica', nargs='?', help="métrica a consultar (sin ella solo se actualiza)")
+    parser.add_argument('--desde')
+    parser.add_argument('--hasta')
+    parser.add_argument('--propiedad')
+    parser.add_argument('--periodo', choices=list(PERIODOS), default='dia')
+    parser.add_argument('--movil', type=int)
+    args = parser.parse_args()
+
+    conexion = sqlite3.connect(ingesta.DB_PATH)
+    actualizar_series(conexion)
+    if args.metrica:
+        print(consultar(conexion, args.metrica, args.desde, args.hasta, args.propiedad,
+                        args.periodo, args.movil).to_string(index=False))
+    else:
+        for (metrica, n) in conexion.execute(
+                "SELECT metrica, COUNT(*) FROM series_diarias GROUP BY metrica ORDER BY metrica"):
+            print(f"{metrica}: {n} días")
+    conexion.close()
@@ -0,0 +1,274 @@
+import argparse
+import hashlib
+import html
+import io
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import quote, unquote
+
+import matplotlib
+matplotlib.use('Agg')  # el servidor nunca abre ventanas
+
+import ingesta
+import staging
+
+# Imágenes/JSON renderizados que se guardan en memoria (las más recientes)
+MAX_CACHE = 128
+# Hilos fijos que atienden peticiones; cada uno conserva su conexión de SQLite
+HILOS = 8
+
+_local = threading.local()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_render_locks = {}
+# Peticiones que están usando los datos de staging y si hay una recarga en curso
+_datos = threading.Condition()
+_lectores = 0
+_recargando = False
+_estado_cargado = None
+
+
+def conexion():
+    """Una conexión de SQLite por hilo de trabajo, reutilizada entre peticiones."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = sqlite3.connect(ingesta.DB_PATH)
+    return conn
+
+
+def estado_db():
+    """
+    Estado de cambios de la base a partir de _versiones.
+
+    Returns:
+        Tupla (huella, fecha de la última modificación)
+    """
+    conn = conexion()
+    filas = []
+    if ingesta._existe(conn, '_versiones'):  # solo se lee: la base la escribe main.py
+        filas = conn.execute("SELECT tabla, version, actualizado FROM _versiones ORDER BY tabla").fetchall()
+    huella = hashlib.sha1(repr([f[:2] for f in filas]).encode()).hexdigest()[:16]
+    ultima = max((f[2] for f in filas), default=None)
+    modificado = datetime.fromisoformat(ultima).astimezone() if ultima else datetime.now().astimezone()
+    return huella, modificado.replace(microsecond=0)
+
+
+def cargar_datos():
+    """Carga staging (solo lectura, ver staging.load_data) y recuerda el estado de la base."""
+    global _estado_cargado
+    staging.cargar()
+    _estado_cargado = estado_db()[0]
+
+
+@contextmanager
+def usando_datos(huella):
+    """
+    Marca una petición que lee los datos y plantillas de staging.
+
+    staging.cargar() reemplaza variables globales del módulo, así que si la base
+    cambió la recarga espera a que terminen las peticiones en curso y las nuevas
+    esperan a que termine la recarga; fuera de eso las peticiones corren en paralelo.
+    """
+    global _lectores, _recargando, _estado_cargado
+    with _datos:
+        while _recargando:
+            _datos.wait()
+        if _estado_cargado != huella:
+            _recargando = True
+            try:
+                while _lectores:
+                    _datos.wait()
+                staging.cargar()
+                _estado_cargado = huella
+            finally:
+                _recargando = False
+                _datos.notify_all()
+        _lectores += 1
+    try:
+        yield
+    finally:
+        with _datos:
+            _lectores -= 1
+            if not _lectores:
+                _datos.notify_all()
+
+
+def plantillas():
+    """Plantillas del dashboard por nombre."""
+    return {fn.__name__: fn for fn in staging.templates}
+
+
+def _render_png(fn):
+    fig = staging.render_figure(fn)
+    if fig is None:
+        return None
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight')
+    staging.soltar_figura(fn)
+    return buf.getvalue()
+
+
+def _render_json(fn):
+    df = staging.ENTRADAS.get(fn)
+    if df is None:
+        return None
+    return df.to_json(orient='records', force_ascii=False).encode('utf-8')
+
+
+def contenido(nombre, tipo, huella):
+    """
+    Devuelve el PNG o JSON de una gráfica, renderizándolo una sola vez por cambio de datos.
+
+    Returns:
+        bytes, o None si la plantilla no existe o no tiene datos
+    """
+    clave = (nombre, tipo, huella)
+    with _cache_lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+        lock = _render_locks.setdefault(clave, threading.Lock())
+    # Si varios analistas piden la misma gráfica a la vez, solo uno la renderiza
+    with lock:
+        with _cache_lock:
+            if clave in _cache:
+                return _cache[clave]
+        fn = plantillas().get(nombre)
+        datos = None if fn is None else (_render_png(fn) if tipo == 'png' else _render_json(fn))
+        with _cache_lock:
+            _cache[clave] = datos
+            _render_locks.pop(clave, None)
+            while len(_cache) > MAX_CACHE:
+                _cache.popitem(last=False)
+    return datos
+
+
+def indice_html():
+    tarjetas = "\n".join(
+        f'<figure><img src="/graficas/{quote(n, safe="")}.png" alt="{html.escape(n)}" loading="lazy">'
+        f'<figcaption><a href="/datos/{quote(n, safe="")}.json">{html.escape(n)}</a></figcaption></figure>'
+        for n in plantillas())
+    return f"""<!doctype html>
+<html lang="es"><head><meta charset="utf-8"><title>Dashboard de Análisis de Tráfico</title>
+<style>body{{font-family:Helvetica,sans-serif;background:#f0f0f0}}
+main{{display:grid;grid-template-columns:repeat(auto-fill,minmax(270px,1fr));gap:20px}}
+figure{{background:white;border:1px solid #ccc;margin:0;padding:5px}}img{{width:100%}}</style></head>
+<body><h1>Dashboard de Análisis de Tráfico</h1><main>
+{tarjetas}
+</main></body></html>""".encode('utf-8')
+
+
+class ServidorPool(HTTPServer):
+    """
+    HTTPServer que atiende las peticiones con un pool fijo de hilos.
+
+    A diferencia de ThreadingHTTPServer (un hilo nuevo por petición), los hilos
+    se reutilizan, así que la conexión de SQLite de cada uno (ver conexion())
+    sirve para muchas peticiones.
+    """
+
+    def __init__(self, direccion, manejador, hilos=HILOS):
+        super().__init__(direccion, manejador)
+        self.pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='servidor')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class Manejador(BaseHTTPRequestHandler):
+    """Sirve el índice, /graficas/<nombre>.png y /datos/<nombre>.json con ETag/Last-Modified."""
+
+    def do_GET(self):
+        huella, modificado = estado_db()
+        with usando_datos(huella):
+            self._responder(huella, modificado)
+
+    def _responder(self, huella, modificado):
+        ruta = self.path.split('?', 1)[0]
+
+        if ruta in ('/', '/index.html'):
+            tipo, cuerpo, etag = 'text/html; charset=utf-8', None, f'"{huella}-indice"'
+        elif ruta.startswith('/graficas/') and ruta.endswith('.png'):
+            nombre = unquote(ruta[len('/graficas/'):-len('.png')])
+            tipo, cuerpo, etag = 'image/png', None, f'"{huella}-{hashlib.sha1(nombre.encode()).hexdigest()[:8]}-png"'
+        elif ruta.startswith('/datos/') and ruta.endswith('.json'):
+            nombre = unquote(ruta[len('/datos/'):-len('.json')])
+            tipo, cuerpo, etag = 'application/json', None, f'"{huella}-{hashlib.sha1(nombre.encode()).hexdigest()[:8]}-json"'
+        else:
+            self.send_error(404)
+            return
+
+        if self._no_modificado(etag, modificado):
+            self.send_response(304)
+            self._encabezados_cache(etag, modificado)
+            self.end_headers()
+            return
+
+        if tipo.startswith('text/html'):
+            cuerpo = indice_html()
+        else:
+            cuerpo = contenido(nombre, 'png' if tipo == 'image/png' else 'json', huella)
+        if cuerpo is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self._encabezados_cache(etag, modificado)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _encabezados_cache(self, etag, modificado):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', format_datetime(modificado, usegmt=True))
+        self.send_header('Cache-Control', 'no-cache')
+
+    def _no_modificado(self, etag, modificado):
+        si_no_coincide = self.headers.get('If-None-Match')
+        if si_no_coincide is not None:
+            return etag in [e.strip() for e in si_no_coincide.split(',')] or si_no_coincide.strip() == '*'
+        desde = self.headers.get('If-Modified-Since')
+        if desde:
+            try:
+                return modificado <= parsedate_to_datetime(desde)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor HTTP del dashboard")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8000)
+    parser.add_argument('--hilos', type=int, default=HILOS, help="hilos que atienden peticiones")
+    args = parser.parse_args()
+
+    # Los datos se cargan una vez al arrancar; las peticiones solo los vuelven a leer
+    # (sin ingerir nada) cuando main.py actualiza la base
+    cargar_datos()
+    servidor = ServidorPool((args.host, args.puerto), Manejador, args.hilos)
+    print(f"Dashboard en http://{args.host}:{args.puerto}/")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
@@ -1,45 +1,134 @@
+import base64
+import hashlib
+import io
+import os
 import sqlite3
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import tkinter as tk
-from tkinter import ttk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-sns.set_theme(style="whitegrid", palette="muted", font_scale=0.8)
+import ingesta
+import instrumentacion
+import vistas
+
+# pandas, matplotlib, esquema (con pyarrow) y seaborn se importan dentro de las
+# funciones que los usan: importar este módulo (p.ej. benchmark.py, reportes.py)
+# no paga ese costo. seaborn, con pyplot, tarda segundos: lo carga cargar()
+sns = None
 
 # Configuración de la figura
 FIGSIZE = (2.5, 2.5)
 
+# Hilos que preparan datos y rasterizan figuras mientras la ventana ya está visible
+RENDER_WORKERS = 4
+
 # Función para convertir columnas a numéricas
+@instrumentacion.instrumentado('staging.convert_numeric')
 def convert_numeric(df, cols):
+    import pandas as pd
+
     for col in cols:
-        if col in df.columns:
+        # Las tablas ya vienen tipadas desde ingesta.py; solo se coercionan las que no
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
             df[col] = pd.to_numeric(df[col], errors='coerce')
     return df
 
-# Función para cargar datos desde SQLite
+# Con WEBVIEW_DATASET el dashboard lee del dataset Parquet particionado (ver hadoopIns.py)
+DATASET = os.environ.get('WEBVIEW_DATASET')
+# El dashboard muestra una sola propiedad de GA (las gráficas no distinguen propiedades):
+# la de WEBVIEW_PROPIEDAD o, si no está, la que tiene el rango más reciente
+PROPIEDAD = os.environ.get('WEBVIEW_PROPIEDAD')
+
+# Vista materializada que lee el dashboard para cada DataFrame (ver vistas.py)
+FUENTES_DASHBOARD = {
+    'audiences': 'mv_audiences',
+    'demographics': 'mv_demographics_country',
+    'pages': 'mv_pages',
+    'tech_details': 'mv_tech_browser',
+    'tech_overview': 'mv_tech_platform',
+    'tech_device': 'mv_tech_device',
+    'user_acquisition': 'mv_acquisition_channel',
+}
+
+# Propiedad que muestra el dashboard: WEBVIEW_PROPIEDAD o la de rango más reciente
+# (entre las que terminan el mismo día, la primera en orden alfabético)
+def elegir_propiedad(conn):
+    if PROPIEDAD is not None:
+        return PROPIEDAD
+    rangos = sorted((p, fin) for vista in FUENTES_DASHBOARD.values() if vistas._existe(conn, vista)
+                    for p, (_, fin) in vistas.rangos_recientes(conn, vista).items())
+    return max(rangos, key=lambda r: r[1])[0] if rangos else None
+
+# Lee solo las filas del rango de fechas más reciente de una propiedad (o de cada
+# propiedad con propiedad=None) de una tabla o vista
+def leer_rango_reciente(conn, tabla, columnas=None, propiedad=None):
+    import pandas as pd
+    import esquema
+
+    if not vistas._existe(conn, tabla):
+        return pd.DataFrame()
+    rangos = vistas.rangos_recientes(conn, tabla, propiedad)
+    cols = ", ".join(f'"{c}"' for c in ["Property"] + columnas) if columnas else "*"
+    filtro = " OR ".join(['("Property" = ? AND "Start date" = ? AND "End date" = ?)'] * len(rangos)) or "0"
+    params = [valor for p, rango in rangos.items() for valor in (p, *rango)]
+    # Con pyarrow las lecturas repetidas salen del caché columnar (ver cache_columnar.py);
+    # las dimensiones llegan como category y las métricas como int32/float32 (ver esquema.py)
+    return esquema.leer_sql(conn, tabla, f'SELECT {cols} FROM "{tabla}" WHERE {filtro}', params=params)
+
+# Función para cargar datos desde SQLite (solo lectura: la ingesta y las vistas las
+# actualiza main.py, nunca el dashboard)
+@instrumentacion.instrumentado('staging.load_data')
 def load_data():
-    conn = sqlite3.connect('traffic_analysis.db')
-    tables = ['audiences', 'demographics', 'engagement', 'pages',
-              'reports', 'tech_details', 'tech_overview', 'user_acquisition']
-    data = {tbl: pd.read_sql_query(f"SELECT * FROM {tbl}", conn) for tbl in tables}
+    if DATASET:
+        # Solo se leen los archivos del rango más reciente de cada tabla base, a una
+        # base en memoria donde las vistas se calculan igual que en traffic_analysis.db
+        import hadoopIns
+        bases = {vistas.VISTAS[v][0] for v in FUENTES_DASHBOARD.values()} | {'engagement'}
+        conn = hadoopIns.a_sqlite(sorted(bases), DATASET)
+        vistas.refrescar_vistas(conn)
+    else:
+        if not os.path.exists(ingesta.DB_PATH):
+            raise FileNotFoundError(f"No existe {ingesta.DB_PATH}: corre primero main.py para ingerir los exports")
+        conn = sqlite3.connect(f"file:{ingesta.DB_PATH}?mode=ro", uri=True)
+        # Una vista puede faltar si ningún export trae su sección, pero sin ninguna vista
+        # (o con tablas sin Property/Start date/End date) la base es de antes de main.py
+        fuentes = [t for t in [*FUENTES_DASHBOARD.values(), 'engagement'] if vistas._existe(conn, t)]
+        viejas = [t for t in fuentes if not set(ingesta.COLUMNAS_CLAVE) <= set(ingesta._columnas_tabla(conn, t))]
+        if viejas or not set(FUENTES_DASHBOARD.values()) & set(fuentes):
+            conn.close()
+            raise RuntimeError(f"{ingesta.DB_PATH} no tiene las vistas del dashboard o les faltan las columnas "
+                               f"{', '.join(ingesta.COLUMNAS_CLAVE)}: corre primero main.py para ingerir los exports")
+    propiedad = elegir_propiedad(conn)
+    data = {nombre: leer_rango_reciente(conn, vista, propiedad=propiedad) for nombre, vista in FUENTES_DASHBOARD.items()}
+    data['engagement'] = leer_rango_reciente(conn, 'engagement', ["Nth day", "Average engagement time per active user"],
+                                             propiedad)
     conn.close()
     return data
 
-# Cargar y preprocesar dataframes
-dfs = load_data()
-audiences_df = convert_numeric(dfs['audiences'], ["Total users", "New users", "Sessions", "Views per session", "Average session duration", "Total revenue"])
-demographics_df = convert_numeric(dfs['demographics'], ["Active users", "New users", "Engaged sessions", "Event count", "Total revenue"])
-engagement_df = dfs['engagement'].copy()
-tech_details_df = convert_numeric(dfs['tech_details'], ["Active users"])
-tech_overview_df = convert_numeric(dfs['tech_overview'], ["Active users"])
-user_acquisition_df = convert_numeric(dfs['user_acquisition'], ["Total users"])
+# DataFrames del dashboard; los llena cargar() (importar el módulo no lee la base)
+dfs = None
+audiences_df = demographics_df = engagement_df = pages_df = None
+tech_details_df = tech_overview_df = tech_device_df = user_acquisition_df = None
+
+# seaborn se importa y configura (set_theme modifica los rcParams globales) una sola
+# vez en el hilo que llama a cargar(), antes de que los hilos de trabajo creen figuras
+def preparar_seaborn():
+    global sns
+    if sns is None:
+        import seaborn
+        seaborn.set_theme(style="whitegrid", palette="muted", font_scale=0.8)
+        sns = seaborn
+
+# Las figuras se crean sin pyplot para poder construirlas desde hilos de trabajo
+def nueva_figura():
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=FIGSIZE)
+    return fig, fig.subplots()
 
 # Funciones de creación de gráficas (devuelven None si no jala)
 def plot_audiences_bar():
     if audiences_df.empty: return None
-    fig, ax = plt.subplots(figsize=FIGSIZE)
+    fig, ax = nueva_figura()
     melt = audiences_df.melt(id_vars=["Audience name"], value_vars=["Total users", "New users"], var_name="Tipo", value_name="Usuarios")
     sns.barplot(x="Audience name", y="Usuarios", hue="Tipo", data=melt, ax=ax)
     ax.set_title("Usuarios Totales vs Nuevos", fontsize=10)
@@ -54,7 +143,7 @@ def plot_audiences_bar():
 
 def plot_active_by_country():
     if demographics_df.empty or "Country" not in demographics_df.columns: return None
-    fig, ax = plt.subplots(figsize=FIGSIZE)
+    fig, ax = nueva_figura()
     sns.barplot(x="Country", y="Active users", data=demographics_df, ax=ax)
     ax.set_title("Usuarios Activos por País", fontsize=10)
     ax.set_xlabel("País", fontsize=8)
@@ -68,7 +157,7 @@ def plot_active_by_country():
 def plot_engagement_trend():
     if engagement_df.empty or "Nth day" not in engagement_df.columns: return None
     df = convert_numeric(engagement_df, ["Nth day", "Average engagement time per active user"])
-    fig, ax = plt.subplots(figsize=FIGSIZE)
+    fig, ax = nueva_figura()
     sns.lineplot(x="Nth day", y="Average engagement time per active user", data=df, marker="o", ax=ax)
     ax.set_title("Tendencia de Engagement", fontsize=10)
     ax.set_xlabel("Día (Nth)", fontsize=8)
@@ -80,7 +169,7 @@ def plot_engagement_trend():
 
 def plot_platform_active():
     if tech_overview_df.empty or "Platform" not in tech_overview_df.columns: return None
-    fig, ax = plt.subplots(figsize=FIGSIZE)
+    fig, ax = nueva_figura()
     sns.barplot(x="Platform", y="Active users", data=tech_overview_df, ax=ax)
     ax.set_title("Activos por Plataforma", fontsize=10)
     ax.set_xlabel("Plataforma", fontsize=8)
@@ -93,10 +182,9 @@ def plot_platform_active():
 
 def plot_acquisition_pie():
     if user_acquisition_df.empty or "First user primary channel group (Default Channel Group)" not in user_acquisition_df.columns: return None
-    fig, ax = plt.subplots(figsize=FIGSIZE)
-    acq = user_acquisition_df.groupby(
-        "First user primary channel group (Default Channel Group)"
-    )["Total users"].sum().reset_index()
+    fig, ax = nueva_figura()
+    # mv_acquisition_channel ya trae una fila por canal con los usuarios sumados
+    acq = user_acquisition_df
     ax.pie(acq["Total users"], labels=acq["First user primary channel group (Default Channel Group)"], autopct='%1.1f%%', startangle=140, textprops={'fontsize': 6})
     ax.set_title("Canales de Adquisición", fontsize=10)
     fig.tight_layout(pad=1)
@@ -104,10 +192,10 @@ def plot_acquisition_pie():
 
 
 def plot_device_category():
-    col = next((c for c in tech_overview_df.columns if "device" in c.lower()), None)
-    if tech_overview_df.empty or not col: return None
-    fig, ax = plt.subplots(figsize=FIGSIZE)
-    sns.barplot(x=col, y="Active users", data=tech_overview_df, ax=ax)
+    col = next((c for c in tech_device_df.columns if "device" in c.lower()), None)
+    if tech_device_df.empty or not col: return None
+    fig, ax = nueva_figura()
+    sns.barplot(x=col, y="Active users", data=tech_device_df, ax=ax)
     ax.set_title("Activos por Dispositivo", fontsize=10)
     ax.set_xlabel(col, fontsize=8)
     ax.set_ylabel("Activos", fontsize=8)
@@ -119,7 +207,7 @@ def plot_device_category():
 
 def plot_browser_active():
     if tech_details_df.empty or "Browser" not in tech_details_df.columns: return None
-    fig, ax = plt.subplots(figsize=FIGSIZE)
+    fig, ax = nueva_figura()
     sns.barplot(x="Browser", y="Active users", data=tech_details_df, ax=ax)
     ax.set_title("Activos por Navegador", fontsize=10)
     ax.set_xlabel("Navegador", fontsize=8)
@@ -127,16 +215,15 @@ def plot_browser_active():
     ax.tick_params(axis='x', rotation=45, labelsize=6)
     ax.tick_params(axis='y', labelsize=6)
     fig.tight_layout(pad=1)
-    plt.savefig('browser.png', bbox_inches='tight')
+    fig.savefig('browser.png', bbox_inches='tight')
     return fig
 
 
 def plot_engagement_ratio():
-    if demographics_df.empty or "Engaged sessions" not in demographics_df.columns: return None
-    df = demographics_df.copy()
-    df["Ratio"] = df["Engaged sessions"] / df["Active users"].replace(0, pd.NA)
-    fig, ax = plt.subplots(figsize=FIGSIZE)
-    sns.barplot(x="Country", y="Ratio", data=df, ax=ax)
+    # El ratio Engaged sessions / Active users ya viene calculado en mv_demographics_country
+    if demographics_df.empty or "Ratio" not in demographics_df.columns: return None
+    fig, ax = nueva_figura()
+    sns.barplot(x="Country", y="Ratio", data=demographics_df, ax=ax)
     ax.set_title("Ratio Engagement por País", fontsize=10)
     ax.set_xlabel("País", fontsize=8)
     ax.set_ylabel("Ratio", fontsize=8)
@@ -145,8 +232,8 @@ def plot_engagement_ratio():
     fig.tight_layout(pad=1)
     return fig
 
-# Lista de funciones para gráficas
-templates = [
+# Plantillas fijas; cargar() les agrega una por página
+PLANTILLAS_BASE = [
     plot_audiences_bar,
     plot_active_by_country,
     plot_engagement_trend,
@@ -157,45 +244,297 @@ templates = [
     plot_engagement_ratio
 ]
 
-# Se crea interfaz gráfica con tkinter
-root = tk.Tk()
-root.title("Dashboard de Análisis de Tráfico")
-root.geometry("1400x900")  # ventana más grande
-
-# Estilos de tkinter
-style = ttk.Style()
-style.configure("Header.TLabel", font=("Helvetica", 18, "bold"))
-style.configure("Card.TFrame", background="white", borderwidth=1, relief="solid", padding=5)
-
-# Encabezado sticky
-dashboard_header = ttk.Label(root, text="Dashboard de Análisis de Tráfico", style="Header.TLabel")
-dashboard_header.pack(pady=(10, 5))
-
-main_frame = ttk.Frame(root)
-main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-canvas = tk.Canvas(main_frame, background="#f0f0f0")
-canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=canvas.yview)
-scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-canvas.configure(yscrollcommand=scrollbar.set)
-canvas.bind('<Configure>', lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-plots_frame = ttk.Frame(canvas)
-canvas.create_window((0,0), window=plots_frame, anchor="nw")
-
-# Configuración del grid
-for col in range(3):
-    plots_frame.columnconfigure(col, weight=1)
-for row in range(3):
-    plots_frame.rowconfigure(row, weight=1)
-
-# Se ponen las gráficas en el grid
-valid_figs = [fn() for fn in templates if fn()]
-for idx, fig in enumerate(valid_figs[:9]):
-    row, col = divmod(idx, 3)
-    card = ttk.Frame(plots_frame, style="Card.TFrame")
-    card.grid(row=row, column=col, padx=20, pady=20, sticky="nsew")
-    canvas_fig = FigureCanvasTkAgg(fig, master=card)
-    widget = canvas_fig.get_tk_widget()
-    widget.pack(fill=tk.BOTH, expand=True)
-
-root.mainloop()
+# Lista de funciones para gráficas
+templates = list(PLANTILLAS_BASE)
+
+# DataFrame del que depende cada plantilla (su huella decide si se vuelve a renderizar)
+ENTRADAS = {}
+
+# Una tarjeta por página de pages.csv; se generan a partir de los datos
+def plantillas_paginas():
+    col = "Page path and screen class"
+    if pages_df.empty or col not in pages_df.columns: return []
+    plantillas = []
+    for pagina, filas in pages_df.groupby(col, sort=False, observed=True):
+        def plot_page(filas=filas, pagina=pagina):
+            metricas = [m for m in ["Views", "Active users", "Event count"] if m in filas.columns]
+            totales = filas[metricas].sum()
+            fig, ax = nueva_figura()
+            sns.barplot(x=totales.index, y=totales.values, ax=ax)
+            ax.set_title(f"Página {pagina}", fontsize=10)
+            ax.set_xlabel("Métrica", fontsize=8)
+            ax.set_ylabel("Total", fontsize=8)
+            ax.tick_params(axis='x', rotation=45, labelsize=6)
+            ax.tick_params(axis='y', labelsize=6)
+            fig.tight_layout(pad=1)
+            return fig
+        plot_page.__name__ = f"plot_page_{pagina}"
+        ENTRADAS[plot_page] = filas
+        plantillas.append(plot_page)
+    return plantillas
+
+# Cargar y preprocesar dataframes; se vuelve a llamar cuando cambian los datos
+def cargar():
+    global dfs, audiences_df, demographics_df, engagement_df, pages_df
+    global tech_details_df, tech_overview_df, tech_device_df, user_acquisition_df
+    dfs = load_data()
+    audiences_df = convert_numeric(dfs['audiences'], ["Total users", "New users", "Sessions", "Views per session", "Average session duration", "Total revenue"])
+    demographics_df = convert_numeric(dfs['demographics'], ["Active users", "New users", "Engaged sessions", "Event count", "Total revenue"])
+    engagement_df = dfs['engagement'].copy()
+    pages_df = convert_numeric(dfs['pages'], ["Views", "Active users", "Event count"])
+    tech_details_df = convert_numeric(dfs['tech_details'], ["Active users"])
+    tech_overview_df = convert_numeric(dfs['tech_overview'], ["Active users"])
+    tech_device_df = convert_numeric(dfs['tech_device'], ["Active users"])
+    user_acquisition_df = convert_numeric(dfs['user_acquisition'], ["Total users"])
+
+    ENTRADAS.clear()
+    ENTRADAS.update({
+        plot_audiences_bar: audiences_df,
+        plot_active_by_country: demographics_df,
+        plot_engagement_trend: engagement_df,
+        plot_platform_active: tech_overview_df,
+        plot_acquisition_pie: user_acquisition_df,
+        plot_device_category: tech_device_df,
+        plot_browser_active: tech_details_df,
+        plot_engagement_ratio: demographics_df,
+    })
+    templates[:] = PLANTILLAS_BASE + plantillas_paginas()
+    preparar_seaborn()
+    return dfs
+
+# Registro de figuras: nombre de plantilla -> (huella de datos, Figure o None)
+_figuras = {}
+# Segundos que tardó el último render de cada plantilla
+tiempos_render = {}
+
+def huella_df(df):
+    """Huella del contenido de un DataFrame (columnas, tipos y valores)."""
+    import pandas as pd
+
+    h = hashlib.sha1(repr((list(df.columns), [str(t) for t in df.dtypes])).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest()
+
+def render_figure(fn):
+    """Renderiza una plantilla una sola vez mientras no cambien sus datos de entrada."""
+    nombre = fn.__name__
+    df = ENTRADAS.get(fn)
+    huella = huella_df(df) if df is not None else None
+    previo = _figuras.get(nombre)
+    if previo is not None and previo[0] == huella:
+        return previo[1]
+    if previo is not None and previo[1] is not None:
+        import matplotlib.pyplot as plt
+        plt.close(previo[1])
+    inicio = time.perf_counter()
+    with instrumentacion.span(f"plot:{nombre}", filas=len(df) if df is not None else None):
+        fig = fn()
+    tiempos_render[nombre] = time.perf_counter() - inicio
+    _figuras[nombre] = (huella, fig)
+    return fig
+
+def soltar_figura(fn):
+    """Saca una figura del registro y la cierra; se vuelve a renderizar si se pide."""
+    previo = _figuras.pop(fn.__name__, None)
+    if previo is not None and previo[1] is not None:
+        import matplotlib.pyplot as plt
+        plt.close(previo[1])
+
+# La interfaz de Tk solo se arma al ejecutar el script; importar el módulo (p.ej.
+# desde reportes.py en un servidor sin pantalla) no carga datos hasta llamar cargar()
+if __name__ == "__main__":
+    import tkinter as tk
+    from tkinter import ttk
+    import matplotlib
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+    # Tamaño fijo de cada tarjeta en pixeles (la figura más el padding del estilo)
+    TARJETA_PX = int(FIGSIZE[0] * matplotlib.rcParams['figure.dpi']) + 10
+
+    cargar()
+
+    # Se crea interfaz gráfica con tkinter
+    root = tk.Tk()
+    root.title("Dashboard de Análisis de Tráfico")
+    root.geometry("1400x900")  # ventana más grande
+
+    # Estilos de tkinter
+    style = ttk.Style()
+    style.configure("Header.TLabel", font=("Helvetica", 18, "bold"))
+    style.configure("Card.TFrame", background="white", borderwidth=1, relief="solid", padding=5)
+
+    # Encabezado sticky
+    dashboard_header = ttk.Label(root, text="Dashboard de Análisis de Tráfico", style="Header.TLabel")
+    dashboard_header.pack(pady=(10, 5))
+
+    main_frame = ttk.Frame(root)
+    main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+    canvas = tk.Canvas(main_frame, background="#f0f0f0")
+    canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=canvas.yview)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    canvas.configure(yscrollcommand=lambda *args: (scrollbar.set(*args), programar_visibles()))
+    canvas.bind('<Configure>', lambda e: (canvas.configure(scrollregion=canvas.bbox("all")), programar_visibles()))
+    plots_frame = ttk.Frame(canvas)
+    plots_frame.bind('<Configure>', lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+    canvas.create_window((0,0), window=plots_frame, anchor="nw")
+    canvas.bind_all('<MouseWheel>', lambda e: canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+    canvas.bind_all('<Button-4>', lambda e: canvas.yview_scroll(-1, "units"))
+    canvas.bind_all('<Button-5>', lambda e: canvas.yview_scroll(1, "units"))
+
+    # Configuración del grid
+    for col in range(3):
+        plots_frame.columnconfigure(col, weight=1)
+    for row in range(3):
+        plots_frame.rowconfigure(row, weight=1)
+
+    # Tarjetas virtualizadas: cada tarjeta empieza vacía y solo se renderiza (en un hilo de
+    # trabajo) cuando entra a la zona visible del canvas. El hilo rasteriza la figura a
+    # PNG y la tarjeta muestra ese bitmap, sin volver a dibujar en el hilo principal;
+    # el canvas interactivo de matplotlib solo se arma si se hace clic en la tarjeta.
+    # Las que salen de vista liberan su figura, así la memoria no crece con el número
+    # de gráficas. Los cambios de widgets siempre ocurren en el hilo principal.
+    _bitmaps = {}  # nombre de plantilla -> PNG
+
+    def render_worker(fn):
+        fig = render_figure(fn)
+        if fig is not None:
+            agg = FigureCanvasAgg(fig)
+            agg.draw()
+            buf = io.BytesIO()
+            plt.imsave(buf, agg.buffer_rgba(), format='png')
+            _bitmaps[fn.__name__] = buf.getvalue()
+        return fig
+
+    def acomodar_tarjetas():
+        for idx, card in enumerate(tarjetas):
+            row, col = divmod(idx, 3)
+            card.grid(row=row, column=col, padx=20, pady=20, sticky="nsew")
+
+    def limpiar_tarjeta(card):
+        for hijo in card.winfo_children():
+            hijo.destroy()
+
+    def mostrar_viva(card):
+        # Solo al interactuar: FigureCanvasTkAgg vuelve a dibujar la figura en este hilo
+        fn = estado[card]['fn']
+        fig = render_figure(fn)
+        if fig is None:
+            return
+        limpiar_tarjeta(card)
+        FigureCanvasTkAgg(fig, master=card).get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        estado[card].update(modo='viva', imagen=None)
+
+    def mostrar_bitmap(card):
+        fn = estado[card]['fn']
+        limpiar_tarjeta(card)
+        imagen = tk.PhotoImage(data=base64.b64encode(_bitmaps[fn.__name__]))
+        etiqueta = ttk.Label(card, image=imagen, cursor="hand2")
+        etiqueta.pack(fill=tk.BOTH, expand=True)
+        etiqueta.bind('<Button-1>', lambda e, card=card: mostrar_viva(card))
+        estado[card].update(modo='bitmap', imagen=imagen)
+
+    def es_visible(card):
+        # Se cuenta una pantalla extra arriba y abajo para precargar y no parpadear
+        alto = canvas.winfo_height()
+        arriba = canvas.canvasy(0) - alto
+        abajo = canvas.canvasy(0) + 2 * alto
+        y = card.winfo_y()
+        return y + card.winfo_height() >= arriba and y <= abajo
+
+    def actualizar_visibles():
+        global visibles_programado
+        visibles_programado = False
+        for card in list(tarjetas):
+            e = estado[card]
+            if es_visible(card):
+                if e['modo'] != 'vacia' or e['futuro'] is not None:
+                    continue
+                if e['fn'].__name__ in _bitmaps:
+                    mostrar_bitmap(card)
+                else:
+                    e['futuro'] = pool.submit(render_worker, e['fn'])
+                    programar_pendientes()
+            elif e['futuro'] is None:
+                if e['modo'] == 'viva':
+                    mostrar_bitmap(card)
+                # Fuera de vista solo queda el bitmap; la figura se vuelve a renderizar si se pide
+                soltar_figura(e['fn'])
+
+    def programar_visibles():
+        global visibles_programado
+        if not visibles_programado:
+            visibles_programado = True
+            root.after(30, actualizar_visibles)
+
+    def programar_pendientes():
+        global pendientes_programado
+        if not pendientes_programado:
+            pendientes_programado = True
+            root.after(50, revisar_pendientes)
+
+    def mostrar_error(card, error):
+        limpiar_tarjeta(card)
+        ttk.Label(card, text=f"Error en {estado[card]['fn'].__name__}:\n{error}", anchor="center",
+                  wraplength=TARJETA_PX - 20).pack(fill=tk.BOTH, expand=True)
+        estado[card].update(modo='error', imagen=None)
+
+    def revisar_pendientes():
+        global pendientes_programado
+        pendientes_programado = False
+        # El sondeo se vuelve a programar aunque algo falle: si no, las demás
+        # tarjetas se quedarían en "Cargando…"
+        try:
+            for card in list(tarjetas):
+                e = estado[card]
+                futuro = e['futuro']
+                if futuro is None:
+                    continue
+                if not futuro.done():
+                    continue
+                e['futuro'] = None
+                try:
+                    fig = futuro.result()
+                except Exception as error:
+                    # Una plantilla que falla muestra su error y no detiene a las demás
+                    print(f"Render {e['fn'].__name__}: error {error!r}")
+                    mostrar_error(card, error)
+                    continue
+                print(f"Render {e['fn'].__name__}: {tiempos_render[e['fn'].__name__] * 1000:.0f} ms")
+                if fig is None:
+                    tarjetas.remove(card)
+                    del estado[card]
+                    card.destroy()
+                    acomodar_tarjetas()
+                else:
+                    mostrar_bitmap(card)
+                    if not es_visible(card):
+                        soltar_figura(e['fn'])
+        finally:
+            if any(e['futuro'] is not None for e in estado.values()):
+                programar_pendientes()
+            else:
+                programar_visibles()
+
+    def cerrar():
+        pool.shutdown(wait=False, cancel_futures=True)
+        root.destroy()
+
+    pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS)
+    visibles_programado = False
+    pendientes_programado = False
+    tarjetas = []
+    estado = {}
+    for fn in templates:
+        card = ttk.Frame(plots_frame, style="Card.TFrame", width=TARJETA_PX, height=TARJETA_PX)
+        card.pack_propagate(False)
+        ttk.Label(card, text="Cargando…", anchor="center").pack(fill=tk.BOTH, expand=True)
+        tarjetas.append(card)
+        estado[card] = {'fn': fn, 'modo': 'vacia', 'futuro': None, 'imagen': None}
+    acomodar_tarjetas()
+
+    root.protocol("WM_DELETE_WINDOW", cerrar)
+    programar_visibles()
+    root.mainloop()
@@ -0,0 +1,17 @@
+import pandas as pd
+
+import esquema
+
+
+def test_compactar_texto_no_declarado_a_category():
+    # Sin dtype explícito: pandas >= 3 crea la columna como 'str', antes como object
+    df = pd.DataFrame({"Ciudad": ["Monterrey", "Saltillo"] * 50, "Active users": range(100)})
+    compacto = esquema.compactar(df)
+    assert isinstance(compacto["Ciudad"].dtype, pd.CategoricalDtype)
+    assert compacto["Active users"].dtype == "int32"
+
+
+def test_compactar_texto_casi_unico_se_queda_como_texto():
+    df = pd.DataFrame({"Ciudad": [f"c{i}" for i in range(100)]})
+    compacto = esquema.compactar(df)
+    assert not isinstance(compacto["Ciudad"].dtype, pd.CategoricalDtype)
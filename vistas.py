@@ -0,0 +1,144 @@
+import sqlite3
+
+import ingesta
+import instrumentacion
+from ingesta import _existe, _q
+
+CANAL = "First user primary channel group (Default Channel Group)"
+
+# Vistas materializadas para el dashboard: nombre -> (tabla base, dimensiones, medidas)
+# Cada vista guarda una fila por propiedad, dimensión y rango de fechas, con las sumas ya hechas
+VISTAS = {
+    'mv_audiences': ('audiences', ["Audience name"], [
+        'SUM("Total users") AS "Total users"',
+        'SUM("New users") AS "New users"',
+    ]),
+    'mv_demographics_country': ('demographics', ["Country"], [
+        'SUM("Active users") AS "Active users"',
+        'SUM("New users") AS "New users"',
+        'SUM("Engaged sessions") AS "Engaged sessions"',
+        'SUM("Engaged sessions") * 1.0 / NULLIF(SUM("Active users"), 0) AS "Ratio"',
+    ]),
+    'mv_acquisition_channel': ('user_acquisition', [CANAL], [
+        'SUM("Total users") AS "Total users"',
+    ]),
+    'mv_tech_browser': ('tech_details', ["Browser"], [
+        'SUM("Active users") AS "Active users"',
+    ]),
+    'mv_tech_platform': ('tech_overview', ["Platform"], [
+        'SUM("Active users") AS "Active users"',
+    ]),
+    'mv_tech_device': ('tech_overview__platform_device_category_active_users', ["Platform / device category"], [
+        'SUM("Active users") AS "Active users"',
+    ]),
+    'mv_pages': ('pages', ["Page path and screen class"], [
+        'SUM("Views") AS "Views"',
+        'SUM("Active users") AS "Active users"',
+        'SUM("Event count") AS "Event count"',
+    ]),
+}
+
+RANGO = f'{_q("Start date")}, {_q("End date")}'
+PROPIEDAD = _q("Property")
+
+
+def _select(vista, filtro=""):
+    base, dims, medidas = VISTAS[vista]
+    cols = ", ".join([PROPIEDAD] + [_q(d) for d in dims])
+    return (f"SELECT {cols}, {RANGO}, {', '.join(medidas)} FROM {_q(base)} {filtro} "
+            f"GROUP BY {cols}, {RANGO}")
+
+
+def _reconstruir(conn, vista):
+    base, dims, _ = VISTAS[vista]
+    conn.execute(f"DROP TABLE IF EXISTS {_q(vista)}")
+    conn.execute(f"CREATE TABLE {_q(vista)} AS {_select(vista)}")
+    conn.execute(f"CREATE INDEX {_q('ix_' + vista)} ON {_q(vista)} ({_q(dims[0])})")
+    conn.execute(f"CREATE INDEX {_q('ix_' + vista + '_rango')} ON {_q(vista)} ({PROPIEDAD}, {RANGO})")
+
+
+@instrumentacion.instrumentado()
+def refrescar_vistas(conn):
+    """
+    Actualiza las vistas materializadas cuyas tablas base cambiaron.
+
+    Solo se recalculan los rangos de fechas registrados en _cambios desde la
+    última versión aplicada; si la tabla base se reemplazó completa (o la vista
+    no existe) se reconstruye la vista.
+
+    Args:
+        conn: Conexión a SQLite
+
+    Returns:
+        Diccionario vista -> 'completa', 'incremental' o 'sin cambios'
+    """
+    ingesta.preparar_metadatos(conn)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _vistas (
+            vista        TEXT PRIMARY KEY,
+            version_base INTEGER
+        )""")
+    resultado = {}
+    for vista, (base, _, _) in VISTAS.items():
+        if not _existe(conn, base):
+            continue
+        actual = ingesta.version_tabla(conn, base)
+        fila = conn.execute("SELECT version_base FROM _vistas WHERE vista = ?", (vista,)).fetchone()
+        # Las vistas de antes de agrupar por propiedad se reconstruyen completas
+        vigente = _existe(conn, vista) and "Property" in ingesta._columnas_tabla(conn, vista)
+        aplicada = fila[0] if fila and vigente else None
+        if aplicada == actual:
+            resultado[vista] = 'sin cambios'
+            continue
+        with conn:
+            rangos = []
+            if aplicada is not None:
+                rangos = conn.execute("""
+                    SELECT DISTINCT start_date, end_date FROM _cambios
+                    WHERE tabla = ? AND version > ?""", (base, aplicada)).fetchall()
+            if aplicada is None or any(inicio is None for inicio, _ in rangos):
+                _reconstruir(conn, vista)
+                ingesta.marcar_version(conn, vista)
+                resultado[vista] = 'completa'
+            else:
+                filtro = f'WHERE {_q("Start date")} = ? AND {_q("End date")} = ?'
+                for rango in rangos:
+                    conn.execute(f"DELETE FROM {_q(vista)} {filtro}", rango)
+                    conn.execute(f"INSERT INTO {_q(vista)} {_select(vista, filtro)}", rango)
+                ingesta.marcar_version(conn, vista, rangos)
+                resultado[vista] = 'incremental'
+            conn.execute("INSERT OR REPLACE INTO _vistas (vista, version_base) VALUES (?, ?)",
+                         (vista, actual))
+    return resultado
+
+
+def rangos_recientes(conn, tabla, propiedad=None):
+    """
+    Rango de fechas más reciente de cada propiedad de una tabla.
+
+    Cada propiedad se exporta por separado, así que sus rangos no se mezclan:
+    gana el que termina más tarde y, entre esos, el más largo.
+
+    Args:
+        conn: Conexión a SQLite
+        tabla: Tabla o vista con las columnas Property, Start date y End date
+        propiedad: Solo esta propiedad (None para todas)
+
+    Returns:
+        Diccionario Property -> (Start date, End date), vacío si la tabla está vacía
+    """
+    filtro = f"WHERE {PROPIEDAD} = ?" if propiedad is not None else ""
+    filas = conn.execute(f"""
+        SELECT {PROPIEDAD}, {RANGO} FROM (
+            SELECT {PROPIEDAD}, {RANGO}, ROW_NUMBER() OVER (
+                PARTITION BY {PROPIEDAD} ORDER BY {_q("End date")} DESC, {_q("Start date")} ASC) AS n
+            FROM {_q(tabla)} {filtro})
+        WHERE n = 1 ORDER BY {PROPIEDAD}""", () if propiedad is None else (propiedad,)).fetchall()
+    return {p: (inicio, fin) for p, inicio, fin in filas}
+
+
+if __name__ == "__main__":
+    conexion = sqlite3.connect(ingesta.DB_PATH)
+    for nombre, estado in refrescar_vistas(conexion).items():
+        print(f"{nombre}: {estado}")
+    conexion.close()